@@ -1,9 +1,21 @@
+import mmap
 import re
 from ASTNodes import *
 
 class Token:
+    __slots__ = ('type', 'value', 'location')
+
     def __init__(self, type_, value, position, line, column):
-        self.type, self.value, self.position, self.line, self.column = type_, value, position, line, column
+        self.type, self.value, self.location = type_, value, pack_location(position, line, column)
+
+    @property
+    def position(self): return unpack_location(self.location)[0]
+
+    @property
+    def line(self): return unpack_location(self.location)[1]
+
+    @property
+    def column(self): return unpack_location(self.location)[2]
 
     def __repr__(self):
         return f"Token({self.type}, '{self.value}', pos={self.position}, line={self.line}, col={self.column})"
@@ -29,48 +41,89 @@ class Lexer:
         ('COMMENT', r'//[^\n]*'),
     ]
     KEYWORDS = {'return', 'let', 'const', 'true', 'false', 'define', 'null', 'if', 'else', 'while', 'for', 'class', 'new', 'include'}
+    PATTERN = re.compile('|'.join(f'(?P<{name}>{regex})' for name, regex in TOKEN_SPEC))
+    BYTES_PATTERN = re.compile(PATTERN.pattern.encode())
+    CHUNK_SIZE = 1 << 16
 
     def __init__(self, code):
+        # code is a str, a text file object (read in line-aligned chunks) or a bytes-like
+        # object such as an mmap (scanned in place; positions are then byte offsets).
         self.code = code
 
     def tokenize(self):
-        tokens, line, line_start, last_pos = [], 1, 0, 0
-        pattern = '|'.join(f'(?P<{name}>{regex})' for name, regex in self.TOKEN_SPEC)
-        for match in re.finditer(pattern, self.code):
-            kind, value, position = match.lastgroup, match.group(), match.start()
+        return list(self.tokens())
+
+    def tokens(self):
+        line, line_start, last_pos = 1, 0, 0
+        for kind, value, position, end in self.matches():
             last_pos = position
             column = position - line_start + 1
             if kind == 'NEWLINE':
                 line += 1
-                line_start = match.end()
+                line_start = end
                 continue
             elif kind in ('WHITESPACE', 'COMMENT'):
                 continue
             if kind == 'STRING':
                 value = value[1:-1]
             token_type = value.upper() if kind == 'ID' and value in self.KEYWORDS else kind
-            tokens.append(Token(token_type, value, position, line, column))
-        tokens.append(Token('EOF', 'EOF', last_pos, line, 1))
-        return tokens
+            yield Token(token_type, value, position, line, column)
+        yield Token('EOF', 'EOF', last_pos, line, 1)
+
+    def matches(self):
+        code = self.code
+        if isinstance(code, str):
+            for match in self.PATTERN.finditer(code): yield match.lastgroup, match.group(), match.start(), match.end()
+        elif isinstance(code, (bytes, bytearray, memoryview, mmap.mmap)):
+            for match in self.BYTES_PATTERN.finditer(code): yield match.lastgroup, match.group().decode(), match.start(), match.end()
+        else:
+            yield from self.stream(code)
+
+    def stream(self, file):
+        buffer, offset, eof = '', 0, False
+        while not eof:
+            chunk = file.read(self.CHUNK_SIZE)
+            if chunk: chunk += file.readline()
+            else: eof = True
+            buffer += chunk
+            pos = 0
+            for match in self.PATTERN.finditer(buffer):
+                # Only strings can run past a line break; a skipped quote means one may be cut off.
+                if not eof and match.start() > pos and self.has_quote(buffer, pos, match.start()): break
+                yield match.lastgroup, match.group(), offset + match.start(), offset + match.end()
+                pos = match.end()
+            else:
+                if eof or not self.has_quote(buffer, pos, len(buffer)): pos = len(buffer)
+            buffer, offset = buffer[pos:], offset + pos
+
+    @staticmethod
+    def has_quote(buffer, start, end):
+        return buffer.find('"', start, end) != -1 or buffer.find("'", start, end) != -1
 
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.pos = 0
+        # tokens can be any iterable, e.g. the Lexer.tokens() generator; only the current
+        # token and the one before it are kept.
+        self.tokens = iter(tokens)
+        self.lookahead = next(self.tokens, None)
+        self.previous = None
 
     def current(self):
-        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+        return self.lookahead
 
     def eat(self, type_=None, value=None):
         token = self.current()
         if token and (type_ is None or token.type == type_) and (value is None or token.value == value):
-            self.pos += 1
+            self.previous, self.lookahead = token, next(self.tokens, None)
             return token
         raise SyntaxException(f"Expected {type_}, got '{token.value}'", token)
 
     def last(self):
-        return self.tokens[self.pos-1] if self.pos > 0 else None
+        return self.previous
+
+    def location(self):
+        return self.previous.location
 
     def parse(self):
         statements = []
@@ -100,12 +153,12 @@ class Parser:
         return stmt
 
     def if_statement(self):
-        self.eat('IF'); self.eat('LPAREN'); condition = self.expr(); self.eat('RPAREN')
+        start = self.eat('IF').location; self.eat('LPAREN'); condition = self.expr(); self.eat('RPAREN')
         then_block = self.block()
         else_block = None
         if self.current() and self.current().type == 'ELSE':
             self.eat('ELSE'); else_block = self.block()
-        return IfStatement(condition, then_block, else_block, self.last())
+        return IfStatement(condition, then_block, else_block, self.location(), start)
 
     def var_declaration(self):
         self.eat('LET')
@@ -113,9 +166,9 @@ class Parser:
         self.eat('OP', '=')
         value = self.expr()
         if isinstance(target, VarReference):
-            return VarDeclaration(target.name, value, self.last())
+            return VarDeclaration(target.name, value, self.location())
         if isinstance(target, PropertyAccess):
-            return PropertyDeclaration(target.obj, target.prop, value, self.last())
+            return PropertyDeclaration(target.obj, target.prop, value, self.location())
         raise SyntaxException("Invalid target for variable declaration.", self.last())
 
     def const_declaration(self):
@@ -123,28 +176,28 @@ class Parser:
         name = self.eat('ID').value
         self.eat('OP', '=')
         value = self.expr()
-        return ConstDeclaration(name, value, self.last())
+        return ConstDeclaration(name, value, self.location())
 
     def function_declaration(self):
-        self.eat('DEFINE')
+        start = self.eat('DEFINE').location
         name = self.eat('ID').value
         params = Parameters(self.collection())
         block = self.block()
-        return FunctionDeclaration(block, params, name, self.last())
+        return FunctionDeclaration(block, params, name, self.location(), start)
 
     def return_statement(self):
         self.eat('RETURN')
-        return ReturnStatement(self.expr(), self.last())
+        return ReturnStatement(self.expr(), self.location())
 
     def while_statement(self):
-        self.eat('WHILE')
+        start = self.eat('WHILE').location
         self.eat('LPAREN')
         condition = self.expr()
         self.eat('RPAREN')
-        return WhileStatement(condition, self.block(), self.last())
+        return WhileStatement(condition, self.block(), self.location(), start)
 
     def for_statement(self):
-        self.eat('FOR')
+        start = self.eat('FOR').location
         self.eat('LPAREN')
         init = self.statement() if self.current().type != 'COLON' else None
         self.eat('COLON')
@@ -152,26 +205,26 @@ class Parser:
         self.eat('COLON')
         update = self.expr() if self.current().type != 'RPAREN' else None
         self.eat('RPAREN')
-        return ForStatement(init, condition, update, self.block(), self.last())
+        return ForStatement(init, condition, update, self.block(), self.location(), start)
 
     def class_declaration(self):
-        self.eat('CLASS')
+        start = self.eat('CLASS').location
         name = self.eat('ID').value
         self.eat('LBRACE')
         methods = []
         while self.current().type != 'RBRACE':
-            self.eat('DEFINE')
+            method_start = self.eat('DEFINE').location
             method_name = self.eat('ID').value
             params = Parameters(self.collection())
             body = self.block()
-            methods.append(FunctionDeclaration(body, params, method_name, self.last()))
+            methods.append(FunctionDeclaration(body, params, method_name, self.location(), method_start))
         self.eat('RBRACE')
-        return ClassDeclaration(name, methods, self.last())
+        return ClassDeclaration(name, methods, self.location(), start)
 
     def include(self):
         self.eat('INCLUDE')
         path = self.eat('STRING').value
-        return Include(path, self.last())
+        return Include(path, self.location())
 
     def handle_flag(self):
         flag_name = self.eat('ID').value
@@ -184,11 +237,21 @@ class Parser:
                 if self.current() and self.current().value == ',':
                     self.eat('OP', ',')
             self.eat('RPAREN')
-            return MetadataFlag('include', names, self.last())
+            return MetadataFlag('include', names, self.location())
         elif flag_name == '$name':
-            return MetadataFlag('filename', self.eat('STRING').value, self.last())
+            return MetadataFlag('filename', self.eat('STRING').value, self.location())
+        elif flag_name == '$memoize':
+            # '$memoize = 128' (or '= null' for no limit) applies to the define that follows it
+            size = self.expr()
+            if isinstance(size, NullLiteral): size = 0
+            elif isinstance(size, Number) and size.value > 0: size = size.value
+            else: raise SyntaxException("$memoize expects a positive number of entries or null", self.previous)
+            if self.current().type != 'DEFINE': raise SyntaxException("$memoize must be followed by a define", self.current())
+            declaration = self.function_declaration()
+            declaration.memoize = size
+            return declaration
         else:
-            return MetadataFlag(flag_name[1:], self.expr(), self.last())
+            return MetadataFlag(flag_name[1:], self.expr(), self.location())
 
     def block(self):
         self.eat('LBRACE')
@@ -196,7 +259,7 @@ class Parser:
         while self.current().type != 'RBRACE':
             statements.append(self.statement())
         self.eat('RBRACE')
-        return Block(statements, self.last())
+        return Block(statements, self.location())
 
     def collection(self, type='PAREN'):
         self.eat('L'+type)
@@ -219,7 +282,7 @@ class Parser:
                 if op in ('+', '-', '*', '/', '%', '==', '!=', '<', '>', '<=', '>='):
                     self.eat('OP')
                     right = self.expr()
-                    node = BinaryOp(op, node, right, self.last())
+                    node = BinaryOp(op, node, right, self.location())
 
                 elif op == '=':
                     self.eat('OP')
@@ -228,28 +291,28 @@ class Parser:
 
                 elif op == '++':
                     self.eat('OP')
-                    node = self.assignment(node, BinaryOp('+', node, Number(1, self.last()), self.last()))
+                    node = self.assignment(node, BinaryOp('+', node, Number(1, self.location()), self.location()))
 
                 elif op == '--':
                     self.eat('OP')
-                    node = self.assignment(node, BinaryOp('-', node, Number(1, self.last()), self.last()))
+                    node = self.assignment(node, BinaryOp('-', node, Number(1, self.location()), self.location()))
 
                 elif op == '+=':
                     self.eat('OP')
                     right = self.expr()
-                    node = self.assignment(node, BinaryOp('+', node, right, self.last()))
+                    node = self.assignment(node, BinaryOp('+', node, right, self.location()))
                 elif op == '-=':
                     self.eat('OP')
                     right = self.expr()
-                    node = self.assignment(node, BinaryOp('-', node, right, self.last()))
+                    node = self.assignment(node, BinaryOp('-', node, right, self.location()))
                 elif op == '*=':
                     self.eat('OP')
                     right = self.expr()
-                    node = self.assignment(node, BinaryOp('*', node, right, self.last()))
+                    node = self.assignment(node, BinaryOp('*', node, right, self.location()))
                 elif op == '/=':
                     self.eat('OP')
                     right = self.expr()
-                    node = self.assignment(node, BinaryOp('/', node, right, self.last()))
+                    node = self.assignment(node, BinaryOp('/', node, right, self.location()))
 
                 else:
                     break
@@ -260,10 +323,10 @@ class Parser:
 
     def assignment(self, node, value):
         if isinstance(node, VarReference):
-            return Assignment(node.name, value, self.last())
+            return Assignment(node.name, value, self.location())
 
         elif isinstance(node, PropertyAccess):
-            return PropertyAssignment(node.obj, node.prop, value, self.last())
+            return PropertyAssignment(node.obj, node.prop, value, self.location())
 
         else:
             raise SyntaxException("Assignments can only be use on variables or properties", self.last())
@@ -273,9 +336,9 @@ class Parser:
         while self.current() and self.current().type == 'LPAREN':
             args = self.collection()
             if isinstance(node, PropertyAccess):
-                node = MethodCall(node.obj, node.prop, args, self.last())
+                node = MethodCall(node.obj, node.prop, args, self.location())
             elif isinstance(node, VarReference):
-                node = FunctionCall(node.name, args, self.last())
+                node = FunctionCall(node.name, args, self.location())
             else:
                 raise SyntaxException("Expression is not callable.", self.last())
         return node
@@ -285,34 +348,34 @@ class Parser:
         while self.current() and self.current().type == 'DOT':
             self.eat('DOT')
             prop = self.eat('ID').value
-            node = PropertyAccess(node, prop, self.last())
+            node = PropertyAccess(node, prop, self.location())
         return node
 
     def primary_expression(self):
         tok = self.current()
         if tok.type == 'NUMBER':
-            return Number(self.eat('NUMBER').value, self.last())
+            return Number(self.eat('NUMBER').value, self.location())
         if tok.type == 'FLOAT':
-            return Float(self.eat('FLOAT').value, self.last())
+            return Float(self.eat('FLOAT').value, self.location())
         if tok.type == 'STRING':
-            return String(self.eat('STRING').value, self.last())
+            return String(self.eat('STRING').value, self.location())
         if tok.type == 'LSQUARE':
-            return Array(tuple(self.collection('SQUARE')), self.last())
+            return Array(tuple(self.collection('SQUARE')), self.location())
         if tok.type == 'TRUE':
             self.eat('TRUE')
-            return BooleanLiteral(True, self.last())
+            return BooleanLiteral(True, self.location())
         if tok.type == 'FALSE':
             self.eat('FALSE')
-            return BooleanLiteral(False, self.last())
+            return BooleanLiteral(False, self.location())
         if tok.type == 'NULL':
             self.eat('NULL')
-            return NullLiteral(self.last())
+            return NullLiteral(self.location())
         if tok.type == 'ID':
-            return VarReference(self.eat('ID').value, self.last())
+            return VarReference(self.eat('ID').value, self.location())
         if tok.type == 'NEW':
             self.eat('NEW')
             name = self.eat('ID').value
-            return ClassInstance(name, self.collection(), self.last())
+            return ClassInstance(name, self.collection(), self.location())
         if tok.type == 'LPAREN':
             self.eat('LPAREN')
             expr = self.expr()
@@ -322,8 +385,7 @@ class Parser:
 
 def to_ast(code):
     lexer = Lexer(code)
-    tokens = lexer.tokenize()
-    parser = Parser(tokens)
+    parser = Parser(lexer.tokens())
     return parser.parse()
 
 
@@ -1,8 +1,29 @@
+# Bump when the token or node layout changes, so cached ASTs (see Cache.py) are rebuilt. It lives
+# here rather than in AST.py so a cache hit never has to import (and compile) the lexer.
+VERSION = '8'
+
+# Source locations are packed into a single int (offset << 64 | line << 32 | column), which
+# nodes share with the token they were parsed from. A line or column needs more than 2**32
+# characters of source to overflow its field, and the offset has no limit.
+def pack_location(position, line, column): return position << 64 | line << 32 | column
+
+def unpack_location(location): return location >> 64, location >> 32 & 0xFFFFFFFF, location & 0xFFFFFFFF
+
 class ASTNode:
+    __slots__ = ('location',)
     def __init__(self, location):
         self.location = location
 
+def child_nodes(node):
+    # Every node held in a slot, directly or in a list, for passes that only care about a few node types
+    for cls in type(node).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            value = getattr(node, name, None)
+            if isinstance(value, ASTNode): yield value
+            elif isinstance(value, list): yield from (item for item in value if isinstance(item, ASTNode))
+
 class Number(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, value, location):
         super().__init__(location)
         self.value = int(value)
@@ -10,6 +31,7 @@ class Number(ASTNode):
         return f"Number({self.value})"
 
 class Float(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, value, location):
         super().__init__(location)
         self.value = float(value)
@@ -17,6 +39,7 @@ class Float(ASTNode):
         return f"Float({self.value})"
 
 class String(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, value, location):
         super().__init__(location)
         self.value = value
@@ -24,6 +47,7 @@ class String(ASTNode):
         return f"String({self.value})"
 
 class Array(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, array, location):
         super().__init__(location)
         self.value = tuple([val.value for val in array])
@@ -34,6 +58,7 @@ class Array(ASTNode):
         return f"Array({[val for val in self.value]})"
 
 class BooleanLiteral(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, value, location):
         super().__init__(location)
         self.value = value
@@ -41,52 +66,77 @@ class BooleanLiteral(ASTNode):
         return f"Boolean({self.value})"
 
 class NullLiteral(ASTNode):
+    __slots__ = ()
     def __init__(self, location):
         super().__init__(location)
     def __repr__(self):
         return "Null"
 
 class VarReference(ASTNode):
+    __slots__ = ('name', 'depth', 'slot')
     def __init__(self, name, location):
         super().__init__(location)
         self.name = name
+        self.depth = self.slot = None
     def __repr__(self):
         return f"VarRef({self.name})"
 
 class BinaryOp(ASTNode):
+    __slots__ = ('op', 'left', 'right', 'func')
     def __init__(self, op, left, right, location):
         super().__init__(location)
         self.op = op
         self.left = left
         self.right = right
+        self.func = None  # operator function, bound on first evaluation
     def __repr__(self):
         return f"BinaryOp({self.op}, {self.left}, {self.right})"
 
 class VarDeclaration(ASTNode):
+    __slots__ = ('name', 'value', 'slot')
     def __init__(self, name, value, location):
         super().__init__(location)
         self.name = name
         self.value = value
+        self.slot = None
     def __repr__(self):
         return f"VarDecl({self.name}, {self.value})"
 
 class ConstDeclaration(ASTNode):
+    __slots__ = ('name', 'value', 'slot')
     def __init__(self, name, value, location):
         super().__init__(location)
         self.name = name
         self.value = value
+        self.slot = None
     def __repr__(self):
         return f"ConstDecl({self.name}, {self.value})"
 
 class Assignment(ASTNode):
+    __slots__ = ('name', 'value', 'depth', 'slot', 'constant')
     def __init__(self, name, value, location):
         super().__init__(location)
         self.name = name
         self.value = value
+        self.depth = self.slot = None
+        self.constant = False
     def __repr__(self):
         return f"Assign({self.name}, {self.value})"
 
+class Increment(ASTNode):
+    __slots__ = ('target', 'op', 'amount', 'depth', 'slot', 'constant')
+    def __init__(self, target, op, amount, location):
+        super().__init__(location)
+        self.target = target
+        self.op = op
+        self.amount = amount
+        self.depth = self.slot = None
+        self.constant = False
+    def __repr__(self):
+        return f"Increment({self.target.name} {self.op}= {self.amount})"
+
 class ReturnStatement(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, value, location):
         super().__init__(location)
         self.value = value
@@ -94,15 +144,20 @@ class ReturnStatement(ASTNode):
         return f"Return({self.value})"
 
 class Block(ASTNode):
+    __slots__ = ('statements', 'scope', 'inline')
     def __init__(self, statements, location):
         super().__init__(location)
         self.statements = statements
+        self.scope = None
+        self.inline = False  # set by Resolver when the block declares nothing and can run in the enclosing scope
     def __repr__(self):
         return f"Block({self.statements})"
 
 class IfStatement(ASTNode):
-    def __init__(self, condition, then_block, else_block, location):
+    __slots__ = ('condition', 'then_block', 'else_block', 'start')
+    def __init__(self, condition, then_block, else_block, location, start=None):
         super().__init__(location)
+        self.start = location if start is None else start
         self.condition = condition
         self.then_block = then_block
         self.else_block = else_block
@@ -110,16 +165,20 @@ class IfStatement(ASTNode):
         return f"If({self.condition}, {self.then_block}, {self.else_block})"
 
 class WhileStatement(ASTNode):
-    def __init__(self, condition, block, location):
+    __slots__ = ('condition', 'block', 'start')
+    def __init__(self, condition, block, location, start=None):
         super().__init__(location)
+        self.start = location if start is None else start
         self.condition = condition
         self.block = block
     def __repr__(self):
         return f"While({self.condition}, {self.block})"
 
 class ForStatement(ASTNode):
-    def __init__(self, init, condition, update, block, location):
+    __slots__ = ('init', 'condition', 'update', 'block', 'start')
+    def __init__(self, init, condition, update, block, location, start=None):
         super().__init__(location)
+        self.start = location if start is None else start
         self.init = init
         self.condition = condition
         self.update = update
@@ -128,15 +187,20 @@ class ForStatement(ASTNode):
         return f"For({self.init}, {self.condition}, {self.update}, {self.block})"
 
 class FunctionDeclaration(ASTNode):
-    def __init__(self, block, params, name, location):
+    __slots__ = ('block', 'params', 'name', 'slot', 'scope', 'memoize', 'start')
+    def __init__(self, block, params, name, location, start=None):
         super().__init__(location)
+        self.start = location if start is None else start
         self.block = block
         self.params = params
         self.name = name
+        self.slot = self.scope = None
+        self.memoize = None  # '$memoize = n' before the define: LRU size, 0 for unbounded
     def __repr__(self):
         return f"FunctionDeclaration({self.name} {self.params} {self.block})"
 
 class Parameters(ASTNode):
+    __slots__ = ('params',)
     def __init__(self, params):
         super().__init__(None)
         self.params = params
@@ -144,47 +208,59 @@ class Parameters(ASTNode):
         return f"Parameters({self.params})"
 
 class FunctionCall(ASTNode):
+    __slots__ = ('name', 'args', 'depth', 'slot')
     def __init__(self, name, args, location):
         super().__init__(location)
         self.name = name
         self.args = args
+        self.depth = self.slot = None
     def __repr__(self):
         return f"FunctionCall({self.name}, args={self.args})"
 
 class MethodCall(ASTNode):
+    __slots__ = ('obj', 'method', 'args', 'cache')
     def __init__(self, obj, method, args, location):
         super().__init__(location)
         self.obj = obj
         self.method = method
         self.args = args
+        self.cache = None  # Runtime.InlineCache, created on first call
     def __repr__(self):
         return f"MethodCall(obj={self.obj}, method={self.method}, args={self.args})"
 
 class ClassDeclaration(ASTNode):
-    def __init__(self, name, methods, location):
+    __slots__ = ('name', 'methods', 'slot', 'start')
+    def __init__(self, name, methods, location, start=None):
         super().__init__(location)
+        self.start = location if start is None else start
         self.name = name
         self.methods = methods
+        self.slot = None
     def __repr__(self):
         return f"ClassDeclaration(name={self.name}, methods={self.methods})"
 
 class ClassInstance(ASTNode):
+    __slots__ = ('class_name', 'args', 'depth', 'slot')
     def __init__(self, class_name, args, location):
         super().__init__(location)
         self.class_name = class_name
         self.args = args
+        self.depth = self.slot = None
     def __repr__(self):
         return f"ClassInstance(class_name={self.class_name} args={self.args})"
 
 class PropertyAccess(ASTNode):
+    __slots__ = ('obj', 'prop', 'cache')
     def __init__(self, obj, prop, location):
         super().__init__(location)
         self.obj = obj
         self.prop = prop
+        self.cache = None
     def __repr__(self):
         return f"PropertyAccess(obj={self.obj}, prop={self.prop})"
 
 class PropertyAssignment(ASTNode):
+    __slots__ = ('obj', 'prop', 'value')
     def __init__(self, obj, prop, value, location):
         super().__init__(location)
         self.obj = obj
@@ -194,6 +270,7 @@ class PropertyAssignment(ASTNode):
         return f"PropertyAssignment(obj={self.obj}, prop={self.prop}, value={self.value})"
 
 class PropertyDeclaration(ASTNode):
+    __slots__ = ('obj', 'prop', 'value')
     def __init__(self, obj, prop, value, location):
         super().__init__(location)
         self.obj = obj
@@ -203,6 +280,7 @@ class PropertyDeclaration(ASTNode):
         return f"PropertyDecl(obj={self.obj}, prop={self.prop}, value={self.value})"
 
 class Include(ASTNode):
+    __slots__ = ('path',)
     def __init__(self, path, location):
         super().__init__(location)
         self.path = path
@@ -210,6 +288,7 @@ class Include(ASTNode):
         return f'Include(name={self.path})'
 
 class SelectiveInclude(ASTNode):
+    __slots__ = ('names', 'path')
     def __init__(self, names, path, location):
         super().__init__(location)
         self.names = names
@@ -218,6 +297,7 @@ class SelectiveInclude(ASTNode):
         return f'SelectiveInclude(names={self.names}, path={self.path})'
 
 class StructFlag(ASTNode):
+    __slots__ = ('constructor_name',)
     def __init__(self, constructor_name, location):
         super().__init__(location)
         self.constructor_name = constructor_name
@@ -225,6 +305,7 @@ class StructFlag(ASTNode):
         return f'StructFlag({self.constructor_name})'
 
 class MetadataFlag(ASTNode):
+    __slots__ = ('key', 'value')
     def __init__(self, key, value, location):
         super().__init__(location)
         self.key = key
@@ -237,18 +318,31 @@ class PyPlusPlusException(Exception):
         self.token = token
         self.location = location
         self.message = message
+        self.file = None  # set by ModuleRegistry when raised inside an included .py++ file
         super().__init__(f'{message}{f"; at char {location[0]}, line {location[1]}, col {location[2]}" if location is not None else ""}')
 
+    def __reduce__(self):
+        # Subclasses prefix the message in __init__, so a copy (e.g. from a parallel_map worker) is rebuilt as is
+        return restore_exception, (type(self), self.message, self.location)
+
+def restore_exception(cls, message, location):
+    exception = cls.__new__(cls)
+    PyPlusPlusException.__init__(exception, message, location)
+    return exception
+
+
+def location_of(token):
+    if token is None: return None
+    if isinstance(token, int): return unpack_location(token)
+    return token.position, token.line, token.column
 
 class SyntaxException(PyPlusPlusException):
     def __init__(self, message, token=None):
-        location = (token.position, token.line, token.column) if token is not None else None
-        super().__init__('SyntaxError: '+message, location, token)
+        super().__init__('SyntaxError: '+message, location_of(token), token)
 
 class RuntimeException(PyPlusPlusException):
     def __init__(self, message, token=None):
-        location = (token.position, token.line, token.column) if token is not None else None
-        super().__init__('RuntimeError: '+message, location, token)
+        super().__init__('RuntimeError: '+message, location_of(token), token)
 
 class NameException(RuntimeException):
     def __init__(self, message, token=None):
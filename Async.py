@@ -0,0 +1,64 @@
+import asyncio
+import importlib
+import threading
+from concurrent.futures import Future
+
+# Cooperative runtime for --async. The program and every task started with spawn() (see tasks.py)
+# run on their own thread, but only while holding the baton, so exactly one Py++ task runs at a
+# time and it only gives way at an awaitable builtin. That builtin hands its coroutine to the
+# asyncio event loop on the main thread and releases the baton until the coroutine is done, so
+# the sleeps, file operations and subprocesses of all tasks overlap while the interpreters stay
+# unchanged and single-threaded in effect.
+#
+# A task's interpreter is a fresh instance of the program's engine sharing its ModuleRegistry.
+
+ENGINES = {'tree': ('Runtime', 'Interpreter'), 'closure': ('Closures', 'ClosureInterpreter'), 'vm': ('VM', 'VirtualMachine')}
+
+current = None  # the AsyncRuntime running the program, if any
+
+class AsyncRuntime:
+    def __init__(self, engine, modules):
+        self.engine, self.modules = engine, modules
+        self.baton, self.loop, self.tasks = threading.Lock(), None, []
+
+    def start(self, func, *args):
+        # Runs func(*args) as a new task; the returned concurrent Future is safe to share between threads
+        future = Future()
+        def task():
+            with self.baton:
+                try: future.set_result(func(*args))
+                except BaseException as e: future.set_exception(e)
+        self.tasks.append(future)
+        threading.Thread(target=task, daemon=True).start()
+        return future
+
+    def spawn(self, function, args, node):
+        return self.start(self.engine(modules=self.modules).call, node, function, list(args))
+
+    def wait(self, coroutine):
+        # Called by a task: let the other tasks run until the coroutine has finished on the loop
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        self.baton.release()
+        try:
+            return future.result()
+        finally:
+            self.baton.acquire()
+
+    async def main(self, ast):
+        self.loop = asyncio.get_running_loop()
+        result = await asyncio.wrap_future(self.start(self.engine(modules=self.modules).interpret, ast))
+        while not all(task.done() for task in self.tasks):  # tasks the program spawned but never waited for
+            await asyncio.gather(*(asyncio.wrap_future(task) for task in self.tasks))
+        for task in self.tasks: task.result()  # surface errors of tasks nobody waited for
+        return result
+
+def interpret(ast, engine='tree', modules=None):
+    global current
+    module, name = ENGINES[engine]
+    engine_class = getattr(importlib.import_module(module), name)
+    if modules is None: modules = importlib.import_module('Runtime').ModuleRegistry()
+    current = AsyncRuntime(engine_class, modules)
+    try:
+        return asyncio.run(current.main(ast))
+    finally:
+        current = None
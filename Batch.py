@@ -0,0 +1,174 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Batch mode (--batch): runs many .py++ scripts on a pool of long-lived worker processes instead
+# of one Python process per script. Each worker keeps the parsed and resolved ASTs of the .py++
+# files scripts include (see ModuleRegistry.sources) and Python includes stay imported, so those
+# are loaded once per worker rather than once per script. Every script gets a fresh interpreter,
+# global environment and ModuleRegistry, which executes its .py++ includes again: top-level
+# values of a library are never shared between scripts.
+#
+# Workers are processes fed one request at a time over a pipe (Worker, WorkerPool; Daemon.py
+# uses them too). One that dies while running a script, in native code, by os._exit or at the
+# hands of the OOM killer, is replaced and the script is reported as crashed.
+#
+# For each script the output (what it printed, including error messages), exit status (0, 1 for
+# a Py++ error, 2 for an internal error, the worker's exit status if it crashed, 128 + the signal
+# number if it was killed) and time are collected. Scripts run in the current directory, so
+# includes resolve the same way as when each script is run on its own.
+
+TIMEOUT_STATUS = 124
+sources, options = None, None  # per worker, set by start_worker
+
+def find_scripts(paths):
+    scripts = []
+    for path in paths:
+        if not os.path.isdir(path): scripts.append(path); continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories[:] = sorted(name for name in subdirectories if name != '__pypp_cache__')
+            scripts.extend(os.path.join(directory, name) for name in sorted(files) if name.endswith('.py++'))
+    return scripts
+
+def start_worker(engine, cache, optimize, vectorize):
+    global sources, options
+    import interpreter
+    sources = {}
+    options = interpreter, dict(engine=engine, cache=cache, optimize=optimize, vectorize=vectorize)
+
+def execute(run):
+    # Runs run() with its output captured
+    output, status, value, start = io.StringIO(), 0, None, time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        try:
+            value, _ = run()
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc(file=output)
+            status = 2
+    return {'status': status, 'seconds': time.perf_counter() - start, 'output': output.getvalue(), 'result': None if value is None else repr(value)}
+
+def run_request(request):
+    # {"file": path} or {"source": text}, optionally with the "cwd" to run in
+    from Runtime import ModuleRegistry
+    interpreter, kwargs = options
+    if request.get('cwd'): os.chdir(request['cwd'])  # includes resolve against the client's directory
+    modules = ModuleRegistry(kwargs['optimize'], kwargs['vectorize'], kwargs['cache'], sources)
+    if 'file' in request: return execute(lambda: interpreter.interpret_file(request['file'], modules=modules, **kwargs))
+    source_kwargs = {name: kwargs[name] for name in ('engine', 'optimize', 'vectorize', 'cache')}
+    return execute(lambda: interpreter.interpret_source(request.get('source', ''), modules=modules, **source_kwargs))
+
+def worker_main(connection, engine, cache, optimize, vectorize):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent shuts its workers down itself
+    start_worker(engine, cache, optimize, vectorize)
+    while True:
+        try:
+            requests = connection.recv()
+        except EOFError:
+            return
+        for request in requests: connection.send(run_request(request))
+
+class Worker:
+    def __init__(self, options):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child,) + options, daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, requests):
+        try:
+            self.connection.send(requests)
+        except OSError:
+            pass  # the worker is dead; reply() tells
+
+    def reply(self, timeout=None):
+        # The next reply, or None if the worker did not answer: still running after timeout seconds,
+        # or dead, and then process.exitcode is set
+        try:
+            if self.connection.poll(timeout): return self.connection.recv()
+        except (EOFError, OSError):
+            self.process.join()
+        return None
+
+    def stop(self):
+        self.process.kill(); self.process.join()
+        self.connection.close()
+
+def crash_reply(code, seconds):
+    # Shell conventions: a worker killed by a signal exits with status 128 + the signal number
+    if code < 0: status, reason = 128 - code, f"killed by signal {-code}"
+    else: status, reason = code or 2, f"exited with status {code}"
+    return {'status': status, 'output': f"Worker crashed: {reason}\n", 'result': None, 'seconds': seconds}
+
+class WorkerPool:
+    # Idle workers, each running one batch of requests at a time
+    def __init__(self, count, options):
+        self.options, self.idle = options, queue.Queue()
+        for _ in range(count): self.idle.put(Worker(options))
+
+    def run(self, request, timeout=None):
+        return self.run_all([request], timeout)[0]
+
+    def run_all(self, requests, timeout=None):
+        # Hands the requests to one idle worker, which answers each as soon as it is done with it. A
+        # worker that dies, or is still running a request after timeout seconds, is replaced: that
+        # request gets a crash or timeout reply and the ones after it go to the new worker, so none
+        # runs twice.
+        replies, worker = [], self.idle.get()
+        while len(replies) < len(requests):
+            pending = requests[len(replies):]
+            worker.send(pending)
+            for _ in pending:
+                start = time.perf_counter()
+                reply = worker.reply(timeout)
+                if reply is None:
+                    replies.append(self.failure(worker, timeout, time.perf_counter() - start))
+                    worker = Worker(self.options)
+                    break
+                replies.append(dict(reply, worker=worker.process.pid))
+        self.idle.put(worker)
+        return replies
+
+    def failure(self, worker, timeout, seconds):
+        code = worker.process.exitcode
+        if code is None: reply = {'status': TIMEOUT_STATUS, 'output': f"Timed out after {timeout:g} s\n", 'result': None, 'seconds': seconds}
+        else: reply = crash_reply(code, seconds)
+        reply['worker'] = worker.process.pid
+        worker.stop()
+        return reply
+
+    def close(self):
+        while not self.idle.empty(): self.idle.get().stop()
+
+def run_batch(paths, engine='tree', workers=None, cache=True, optimize=False, vectorize=False, report=None):
+    scripts = find_scripts(paths)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(scripts)))
+    chunksize = max(1, len(scripts) // (workers * 8))
+    chunks = [[{'file': script} for script in scripts[i:i + chunksize]] for i in range(0, len(scripts), chunksize)]
+    results, start = [], time.perf_counter()
+    pool = WorkerPool(workers, (engine, cache, optimize, vectorize))
+    try:
+        with ThreadPoolExecutor(workers) as threads:
+            for chunk, replies in zip(chunks, threads.map(pool.run_all, chunks)):
+                for request, result in zip(chunk, replies):
+                    result['script'] = request['file']
+                    results.append(result)
+                    print(f"{'ok' if not result['status'] else 'FAIL ' + str(result['status']):<7} {result['seconds'] * 1000:9.2f} ms  {result['script']}")
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if result['status'])
+    summary = {'jobs': len(results), 'failed': failed, 'workers': workers, 'seconds': elapsed,
+               'jobs_per_second': len(results) / elapsed if elapsed else 0.0}
+    print(f"{summary['jobs']} jobs, {failed} failed, {workers} workers, {elapsed:.2f} s, {summary['jobs_per_second']:.1f} jobs/s")
+    if report:
+        with open(report, 'w') as f: json.dump({'summary': summary, 'results': results}, f, indent=1)
+    return 1 if failed else 0
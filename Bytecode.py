@@ -0,0 +1,206 @@
+from array import array
+from ASTNodes import *
+from Runtime import BINARY_OPS
+
+# Flat instruction stream for the stack VM (VM.py). Every instruction is one entry in three
+# parallel arrays: the opcode, its integer argument and an index into the node pool that is
+# used for RuntimeException locations. Constants and names live in per-code-object pools.
+
+OPCODES = (
+    'LOAD_CONST', 'LOAD_NAME', 'DECLARE_NAME', 'DECLARE_CONST', 'ASSIGN_NAME', 'BINARY_OP', 'POP_TOP',
+    'JUMP', 'JUMP_IF_FALSE', 'PUSH_SCOPE', 'POP_SCOPE', 'MAKE_FUNCTION', 'MAKE_CLASS', 'CALL_FUNCTION',
+    'NEW_INSTANCE', 'LOAD_METHOD', 'CALL_METHOD', 'LOAD_ATTR', 'STORE_ATTR', 'DECLARE_ATTR',
+    'RETURN_VALUE', 'EVAL_NODE', 'TAIL_CALL', 'LINE_START', 'LINE_END',
+)
+for _code, _name in enumerate(OPCODES): globals()[_name] = _code
+
+OPERATORS = tuple(BINARY_OPS)
+JUMPS = (JUMP, JUMP_IF_FALSE)
+NO_ARG = (POP_TOP, PUSH_SCOPE, POP_SCOPE, RETURN_VALUE)
+VOID_NODES = ('Block', 'IfStatement', 'WhileStatement', 'ForStatement', 'ClassDeclaration', 'ReturnStatement')
+
+class CodeObject:
+    def __init__(self, name):
+        self.name = name
+        self.ops, self.args, self.locs = array('B'), array('i'), array('i')
+        self.consts, self.names, self.nodes = [], [], []
+        self._consts, self._names, self._nodes = {}, {}, {}
+
+    def emit(self, op, arg=0, node=None):
+        self.ops.append(op); self.args.append(arg); self.locs.append(self.add_node(node))
+        return len(self.ops) - 1
+
+    def add_const(self, value):
+        key = (type(value), value)
+        if key not in self._consts: self._consts[key] = len(self.consts); self.consts.append(value)
+        return self._consts[key]
+
+    def add_name(self, name):
+        if name not in self._names: self._names[name] = len(self.names); self.names.append(name)
+        return self._names[name]
+
+    def add_node(self, node):
+        if node not in self._nodes: self._nodes[node] = len(self.nodes); self.nodes.append(node)
+        return self._nodes[node]
+
+    def patch(self, index, target=None): self.args[index] = len(self.ops) if target is None else target
+
+    def __len__(self): return len(self.ops)
+
+    def __repr__(self): return f"<code {self.name}, {len(self)} instructions>"
+
+class Compiler:
+    def __init__(self):
+        self.functions = {}
+        self.code = None
+
+    def compile_program(self, ast_nodes, name='<program>'):
+        code = self.code = CodeObject(name)
+        for i, node in enumerate(ast_nodes): self.statement(node, keep=i == len(ast_nodes) - 1)
+        if not ast_nodes: code.emit(LOAD_CONST, code.add_const(None))
+        code.emit(RETURN_VALUE)
+        self.code = None
+        return code
+
+    def function(self, func_decl):
+        code = self.functions.get(func_decl)
+        if code is None:
+            outer, code = self.code, CodeObject(func_decl.name)
+            self.functions[func_decl] = self.code = code
+            for stmt in func_decl.block.statements: self.statement(stmt)
+            code.emit(LOAD_CONST, code.add_const(None)); code.emit(RETURN_VALUE)
+            self.code = outer
+        return code
+
+    def statement(self, node, keep=False):
+        self.compile(node)
+        if type(node).__name__ in VOID_NODES:
+            if keep: self.code.emit(LOAD_CONST, self.code.add_const(None))
+        elif not keep: self.code.emit(POP_TOP)
+
+    def compile(self, node):
+        compiler = getattr(self, f"compile_{type(node).__name__}", None)
+        if compiler is None: self.code.emit(EVAL_NODE, self.code.add_const(node), node)  # run through the tree walker
+        else: compiler(node)
+
+    def compile_NoneType(self, node): self.code.emit(LOAD_CONST, self.code.add_const(None))
+
+    def compile_Number(self, node): self.code.emit(LOAD_CONST, self.code.add_const(node.value), node)
+
+    compile_String = compile_Float = compile_Array = compile_BooleanLiteral = compile_Number
+
+    compile_NullLiteral = compile_NoneType
+
+    def compile_VarReference(self, node): self.code.emit(LOAD_NAME, self.code.add_name(node.name), node)
+
+    def compile_BinaryOp(self, node):
+        self.compile(node.left); self.compile(node.right)
+        index = OPERATORS.index(node.op) if node.op in OPERATORS else -1
+        if index >= 0 and node.func is not None and node.func is not BINARY_OPS[node.op]: index += len(OPERATORS)  # --vectorize
+        self.code.emit(BINARY_OP, index, node)
+
+    def compile_VarDeclaration(self, node, op=DECLARE_NAME):
+        self.compile(node.value); self.code.emit(op, self.code.add_name(node.name), node)
+
+    def compile_ConstDeclaration(self, node): self.compile_VarDeclaration(node, DECLARE_CONST)
+
+    def compile_Assignment(self, node): self.compile_VarDeclaration(node, ASSIGN_NAME)
+
+    def compile_Increment(self, node):
+        self.compile(node.target); self.code.emit(LOAD_CONST, self.code.add_const(node.amount))
+        self.code.emit(BINARY_OP, OPERATORS.index(node.op), node)
+        self.code.emit(ASSIGN_NAME, self.code.add_name(node.target.name), node)
+
+    def compile_Block(self, node):
+        if not node.inline: self.code.emit(PUSH_SCOPE)
+        for stmt in node.statements: self.statement(stmt)
+        if not node.inline: self.code.emit(POP_SCOPE)
+
+    def compile_IfStatement(self, node):
+        code = self.code
+        self.compile(node.condition); to_else = code.emit(JUMP_IF_FALSE)
+        self.compile(node.then_block)
+        if node.else_block:
+            to_end = code.emit(JUMP); code.patch(to_else)
+            self.compile(node.else_block); code.patch(to_end)
+        else:
+            code.patch(to_else)
+
+    def compile_WhileStatement(self, node):
+        code = self.code
+        start = len(code); self.compile(node.condition); to_end = code.emit(JUMP_IF_FALSE)
+        self.compile(node.block)
+        code.emit(JUMP, start); code.patch(to_end)
+
+    def compile_ForStatement(self, node):
+        code = self.code
+        if node.init: self.statement(node.init)
+        start, to_end = len(code), None
+        if node.condition: self.compile(node.condition); to_end = code.emit(JUMP_IF_FALSE)
+        self.compile(node.block)
+        if node.update: self.statement(node.update)
+        code.emit(JUMP, start)
+        if to_end is not None: code.patch(to_end)
+
+    def compile_FunctionDeclaration(self, node):
+        self.function(node)
+        self.code.emit(MAKE_FUNCTION, self.code.add_const(node), node)
+
+    def compile_ClassDeclaration(self, node):
+        for method in node.methods: self.function(method)
+        self.code.emit(MAKE_CLASS, self.code.add_const(node), node)
+
+    def compile_FunctionCall(self, node):
+        self.code.emit(LOAD_NAME, self.code.add_name(node.name), node)
+        for arg in node.args: self.compile(arg)
+        self.code.emit(CALL_FUNCTION, len(node.args), node)
+
+    def compile_ClassInstance(self, node):
+        self.code.emit(LOAD_NAME, self.code.add_name(node.class_name), node)
+        for arg in node.args: self.compile(arg)
+        self.code.emit(NEW_INSTANCE, len(node.args), node)
+
+    def compile_ReturnStatement(self, node):
+        call = node.value
+        if call.__class__ is FunctionCall:  # 'return f(...)' leaves the call to the caller's frame
+            self.code.emit(LOAD_NAME, self.code.add_name(call.name), call)
+            for arg in call.args: self.compile(arg)
+            self.code.emit(TAIL_CALL, len(call.args), call)
+        else:
+            self.compile(node.value); self.code.emit(RETURN_VALUE, 0, node)
+
+    def compile_MethodCall(self, node):
+        self.compile(node.obj); self.code.emit(LOAD_METHOD, self.code.add_name(node.method), node)
+        for arg in node.args: self.compile(arg)
+        self.code.emit(CALL_METHOD, len(node.args), node)
+
+    def compile_PropertyAccess(self, node):
+        self.compile(node.obj); self.code.emit(LOAD_ATTR, self.code.add_name(node.prop), node)
+
+    def compile_PropertyAssignment(self, node, op=STORE_ATTR):
+        self.compile(node.obj); self.compile(node.value); self.code.emit(op, self.code.add_name(node.prop), node)
+
+    def compile_PropertyDeclaration(self, node): self.compile_PropertyAssignment(node, DECLARE_ATTR)
+
+
+def compile_program(ast):
+    compiler = Compiler()
+    return compiler.compile_program(ast), compiler
+
+def disassemble(code, functions=None):
+    lines = [f"Disassembly of {code.name}:"]
+    targets = {code.args[i] for i in range(len(code)) if code.ops[i] in JUMPS}
+    for i in range(len(code)):
+        op, arg, node = code.ops[i], code.args[i], code.nodes[code.locs[i]]
+        if op in (LOAD_CONST, EVAL_NODE): detail = repr(code.consts[arg])
+        elif op in (MAKE_FUNCTION, MAKE_CLASS): detail = code.consts[arg].name
+        elif op in (LOAD_NAME, DECLARE_NAME, DECLARE_CONST, ASSIGN_NAME, LOAD_METHOD, LOAD_ATTR, STORE_ATTR, DECLARE_ATTR): detail = code.names[arg]
+        elif op == BINARY_OP: detail = ('?' if arg < 0 else OPERATORS[arg] if arg < len(OPERATORS) else f"vector {OPERATORS[arg - len(OPERATORS)]}")
+        elif op in JUMPS: detail = f"to {arg}"
+        elif op in (LINE_START, LINE_END): detail = f"line {arg}"
+        else: detail = ''
+        line = str(unpack_location(node.location)[1]) if node is not None and node.location is not None else ''
+        lines.append(f"{line:>5} {'>>' if i in targets else '  '} {i:>4} {OPCODES[op]:<15}{arg if op not in NO_ARG else '':>4} {f'({detail})' if detail else ''}".rstrip())
+    for func_code in (functions or {}).values():
+        lines.append(''); lines.append(disassemble(func_code))
+    return '\n'.join(lines)
@@ -0,0 +1,56 @@
+import gc
+import hashlib
+import os
+import pickle
+import sys
+from ASTNodes import VERSION
+
+# On-disk cache of parsed programs. The AST of 'dir/file.py++' is pickled to
+# 'dir/__pypp_cache__/file.py++c' together with a key made from the source text, the parser
+# version (ASTNodes.VERSION) and the Python version, so a stale or foreign entry is simply rebuilt.
+
+CACHE_DIR = '__pypp_cache__'
+
+def cache_path(file):
+    directory, name = os.path.split(os.path.abspath(file))
+    return os.path.join(directory, CACHE_DIR, name + 'c')
+
+def source_key(file):
+    digest = hashlib.sha256(f"{VERSION}:{sys.version_info[0]}.{sys.version_info[1]}:".encode())
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''): digest.update(block)
+    return digest.hexdigest()
+
+def read_cache(path, key):
+    enabled = gc.isenabled()
+    try:
+        with open(path, 'rb') as f:
+            if pickle.load(f) != key: return None
+            gc.disable()  # unpickling allocates one object per node; collections only slow it down
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError):
+        return None
+    finally:
+        if enabled: gc.enable()
+
+def write_cache(path, key, ast):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump(key, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(ast, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except (OSError, pickle.PicklingError, RecursionError):
+        # A read-only directory or a too deeply nested tree only costs us the cache.
+        try: os.remove(tmp)
+        except OSError: pass
+
+def load_ast(file):
+    path, key = cache_path(file), source_key(file)
+    ast = read_cache(path, key)
+    if ast is None:
+        import AST
+        with open(file, 'r') as f: ast = AST.to_ast(f)
+        write_cache(path, key, ast)
+    return ast
@@ -0,0 +1,28 @@
+import json
+import os
+import socket
+import sys
+
+# Thin client for a running daemon (python interpreter.py --daemon SOCKET). Imports nothing from
+# the interpreter, so its own startup stays at that of a bare Python process:
+#   python Client.py SOCKET program.py++      runs a file
+#   python Client.py SOCKET -c "source"       runs source text
+# Prints what the program printed and exits with its status (124 if it timed out, the worker's
+# exit status if it crashed).
+
+def request(path, source=None, file=None, timeout=None):
+    message = {'cwd': os.getcwd(), 'timeout': timeout}
+    if file is not None: message['file'] = os.path.abspath(file)
+    else: message['source'] = source
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(json.dumps(message).encode() + b'\n')
+        with connection.makefile('rb') as reply:
+            return json.loads(reply.readline())
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[2] == '-c': reply = request(sys.argv[1], source=sys.argv[3])
+    elif len(sys.argv) == 3: reply = request(sys.argv[1], file=sys.argv[2])
+    else: sys.exit("usage: Client.py SOCKET FILE | Client.py SOCKET -c SOURCE")
+    sys.stdout.write(reply['output'])
+    sys.exit(reply['status'])
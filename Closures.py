@@ -0,0 +1,367 @@
+from ASTNodes import *
+from Runtime import BINARY_OPS, MISSING, user_function, operator_error, inline_cache, native_method, native_property, Interpreter, UserDefinedFunction, ClassObject, InstanceObject, RETURN, scope_environment, loop_scope, CALLER_TYPES
+
+# Closure-compiling engine: every node is turned into a pre-bound Python closure once,
+# so running a program is a chain of plain calls instead of Interpreter.visit dispatch.
+# Runtime objects (Environment, UserDefinedFunction, ClassObject, InstanceObject) are shared
+# with the tree walker, so values and RuntimeException locations are the same.
+
+class ClosureInterpreter(Interpreter):
+    def __init__(self, modules=None, environment=None):
+        super().__init__(modules, environment)
+        self.functions = {}
+
+    def interpret(self, ast_nodes):
+        statements = [self.compile(node) for node in ast_nodes]
+        result = None
+        for stmt in statements:
+            result = stmt()
+            if result is RETURN: return self.finish_return(), self.environment
+        return result, self.environment
+
+    def compile(self, node):
+        compiler = getattr(self, f"compile_{type(node).__name__}", None)
+        if compiler is None: return lambda: self.visit(node)  # nodes without a compiler fall back to the tree walker
+        return compiler(node)
+
+    def execute_body(self, func_decl):
+        body = self.functions.get(func_decl)
+        if body is None: body = self.functions[func_decl] = self.compile_Block(func_decl.block, create_new_scope=False)
+        return body()
+
+    def compile_lookup(self, node, name):
+        depth, slot = node.depth, node.slot
+        if depth is None or depth == 0 and slot is None:
+            def lookup(): return self.environment.lookup(name, node)
+        elif slot is None and depth == 1:
+            def lookup(): return self.environment.parent.lookup(name, node)
+        elif slot is None and depth == 2:
+            def lookup(): return self.environment.parent.parent.lookup(name, node)
+        elif slot is None:
+            def lookup(): return self.environment.ancestor(depth).lookup(name, node)
+        elif depth == 0:
+            def lookup(): return self.environment.slots[slot]
+        elif depth == 1:
+            def lookup(): return self.environment.parent.slots[slot]
+        else:
+            def lookup(): return self.environment.ancestor(depth).slots[slot]
+        return lookup
+
+    def compile_declare(self, node, name, is_constant=False):
+        slot = node.slot
+        if slot is None:
+            def declare(value): return self.environment.declare(name, value, node, is_constant)
+        else:
+            def declare(value): return self.environment.declare_slot(slot, name, value, node)
+        return declare
+
+    def compile_store(self, node, name):
+        depth, slot = node.depth, node.slot
+        if node.constant:
+            def store(value): raise TypeException(f"Cannot assign to constant '{name}'.", node.location)
+        elif depth is None or depth == 0 and slot is None:
+            def store(value): return self.environment.assign(name, value, node)
+        elif slot is None and depth == 1:
+            def store(value): return self.environment.parent.assign(name, value, node)
+        elif slot is None:
+            def store(value): return self.environment.ancestor(depth).assign(name, value, node)
+        elif depth == 0:
+            def store(value):
+                self.environment.slots[slot] = value; return value
+        else:
+            def store(value):
+                self.environment.ancestor(depth).slots[slot] = value; return value
+        return store
+
+    def compile_NoneType(self, node): return lambda: None
+
+    def compile_Number(self, node):
+        value = node.value
+        return lambda: value
+
+    compile_String = compile_Float = compile_Array = compile_BooleanLiteral = compile_Number
+
+    def compile_NullLiteral(self, node): return lambda: None
+
+    def compile_VarReference(self, node):
+        return self.compile_lookup(node, node.name)
+
+    def compile_BinaryOp(self, node):
+        left, right, op, location = self.compile(node.left), self.compile(node.right), node.op, node.location
+        func = node.func or BINARY_OPS.get(op)  # node.func is only set ahead of time by --vectorize
+
+        if func is None:
+            def unknown_op():
+                left(); right()
+                raise TypeException(f"Unknown operator '{op}'", location)
+            return unknown_op
+
+        def checked(a, b):
+            try:
+                result = func(a, b)
+            except Exception:
+                raise operator_error(node, a, b)
+            if result.__class__ is str and result == 'undefined': raise operator_error(node, a, b)
+            return result
+
+        # int op int can neither raise nor produce 'undefined', so the hot operators get it inline
+        if op == '+':
+            def binary_op():
+                a, b = left(), right()
+                return a + b if a.__class__ is int and b.__class__ is int else checked(a, b)
+        elif op == '-':
+            def binary_op():
+                a, b = left(), right()
+                return a - b if a.__class__ is int and b.__class__ is int else checked(a, b)
+        elif op == '*':
+            def binary_op():
+                a, b = left(), right()
+                return a * b if a.__class__ is int and b.__class__ is int else checked(a, b)
+        elif op == '<':
+            def binary_op():
+                a, b = left(), right()
+                return a < b if a.__class__ is int and b.__class__ is int else checked(a, b)
+        elif op == '>':
+            def binary_op():
+                a, b = left(), right()
+                return a > b if a.__class__ is int and b.__class__ is int else checked(a, b)
+        elif op == '<=':
+            def binary_op():
+                a, b = left(), right()
+                return a <= b if a.__class__ is int and b.__class__ is int else checked(a, b)
+        elif op == '>=':
+            def binary_op():
+                a, b = left(), right()
+                return a >= b if a.__class__ is int and b.__class__ is int else checked(a, b)
+        else:
+            def binary_op(): return checked(left(), right())
+        return binary_op
+
+    def compile_VarDeclaration(self, node, is_constant=False):
+        declare, value = self.compile_declare(node, node.name, is_constant), self.compile(node.value)
+        def declaration(): return declare(value())
+        return declaration
+
+    def compile_ConstDeclaration(self, node): return self.compile_VarDeclaration(node, is_constant=True)
+
+    def compile_Assignment(self, node):
+        store, value = self.compile_store(node, node.name), self.compile(node.value)
+        def assignment(): return store(value())
+        return assignment
+
+    def compile_Increment(self, node):
+        target, store, op, amount = self.compile(node.target), self.compile_store(node, node.target.name), node.op, node.amount
+        def increment():
+            value = target()
+            try:
+                result = value + amount if op == '+' else value - amount
+            except Exception:
+                raise operator_error(node, value, amount)
+            if result.__class__ is str and result == 'undefined': raise operator_error(node, value, amount)
+            return store(result)
+        return increment
+
+    def compile_Block(self, node, create_new_scope=True):
+        statements, scope = tuple(self.compile(stmt) for stmt in node.statements), node.scope
+        if not create_new_scope or node.inline:
+            def body():
+                for stmt in statements:
+                    if stmt() is RETURN: return RETURN
+            return body
+
+        def block():
+            self.environment = scope_environment(scope, self.environment)
+            try:
+                for stmt in statements:
+                    if stmt() is RETURN: return RETURN
+            finally:
+                self.environment = self.environment.parent
+        return block
+
+    def compile_IfStatement(self, node):
+        condition, then_block = self.compile(node.condition), self.compile(node.then_block)
+        else_block = self.compile(node.else_block) if node.else_block else None
+        def if_statement():
+            if condition(): return then_block()
+            elif else_block: return else_block()
+        return if_statement
+
+    def compile_WhileStatement(self, node):
+        condition, block = self.compile(node.condition), node.block
+        if block.inline or block.scope is None:
+            block = self.compile(block)
+            def while_statement():
+                while condition():
+                    if block() is RETURN: return RETURN
+            return while_statement
+
+        body = self.compile_Block(block, create_new_scope=False)
+        def scoped_while_statement():
+            outer = self.environment; loop = loop_scope(block, outer)
+            try:
+                while condition():
+                    self.environment = loop.enter()
+                    result = body()
+                    self.environment = outer
+                    if result is RETURN: return RETURN
+            finally:
+                self.environment = outer
+        return scoped_while_statement
+
+    def compile_ForStatement(self, node):
+        init = self.compile(node.init) if node.init else None
+        condition = self.compile(node.condition) if node.condition else None
+        update = self.compile(node.update) if node.update else None
+        block = node.block
+        if block.inline or block.scope is None:
+            block = self.compile(block)
+            def for_statement():
+                if init: init()
+                while True:
+                    if condition and not condition(): break
+                    if block() is RETURN: return RETURN
+                    if update: update()
+            return for_statement
+
+        body = self.compile_Block(block, create_new_scope=False)
+        def scoped_for_statement():
+            if init: init()
+            outer = self.environment; loop = loop_scope(block, outer)
+            try:
+                while True:
+                    if condition and not condition(): break
+                    self.environment = loop.enter()
+                    result = body()
+                    self.environment = outer
+                    if result is RETURN: return RETURN
+                    if update: update()
+            finally:
+                self.environment = outer
+        return scoped_for_statement
+
+    def compile_FunctionDeclaration(self, node):
+        declare = self.compile_declare(node, node.name)
+        self.functions[node] = self.compile_Block(node.block, create_new_scope=False)
+        def function_declaration(): return declare(user_function(node, self.environment, self))
+        return function_declaration
+
+    def compile_FunctionCall(self, node):
+        name, lookup, args = node.name, self.compile_lookup(node, node.name), tuple(self.compile(arg) for arg in node.args)
+        def function_call():
+            callee = lookup(); values = [arg() for arg in args]
+            if isinstance(callee, UserDefinedFunction): return self.execute_function(callee, values, node)
+            if isinstance(callee, ClassObject): return callee.instantiate(self, values, node)
+            if callee.__class__ in CALLER_TYPES: return callee.call_from(self, node, values)
+            if callable(callee): return callee(*values)
+            raise TypeException(f"'{name}' is not callable", node.location)
+        return function_call
+
+    def compile_ReturnStatement(self, node):
+        call = node.value
+        if call.__class__ is FunctionCall:
+            lookup, args = self.compile_lookup(call, call.name), tuple(self.compile(arg) for arg in call.args)
+            def tail_call():
+                callee = lookup(); values = [arg() for arg in args]
+                if callee.__class__ is UserDefinedFunction: self.tail_call = (callee, values, call)
+                else: self.return_value = self.call(call, callee, values)
+                return RETURN
+            return tail_call
+
+        value = self.compile(node.value)
+        def return_statement():
+            self.return_value = value()
+            return RETURN
+        return return_statement
+
+    def compile_ClassDeclaration(self, node):
+        name, methods, declare = node.name, node.methods, self.compile_declare(node, node.name)
+        for method in methods: self.functions[method] = self.compile_Block(method.block, create_new_scope=False)
+        def class_declaration(): declare(ClassObject(name, methods))
+        return class_declaration
+
+    def compile_ClassInstance(self, node):
+        class_name, lookup, args = node.class_name, self.compile_lookup(node, node.class_name), tuple(self.compile(arg) for arg in node.args)
+        def class_instance():
+            klass = lookup()
+            values = [arg() for arg in args]
+            if isinstance(klass, ClassObject): return klass.instantiate(self, values, node)
+            elif isinstance(klass, type): return klass(*values)
+            raise TypeError(f"'{class_name}' is not a class")
+        return class_instance
+
+    def compile_MethodCall(self, node):
+        obj, method_name, args = self.compile(node.obj), node.method, tuple(self.compile(arg) for arg in node.args)
+        cache = node.cache or inline_cache(node); entries, store = cache.entries, cache.store
+        def method_call():
+            instance = obj()
+            if instance.__class__ is InstanceObject:
+                klass = instance.klass
+                method = entries.get(klass)
+                if method is None: method = store(klass, klass.method(method_name, node))
+                else: cache.hits += 1
+                return self.execute_function(method, [arg() for arg in args], node, self_env=instance)
+
+            klass = instance.__class__
+            method = entries.get(klass, MISSING)
+            if method is MISSING: method = store(klass, native_method(klass, method_name))
+            else: cache.hits += 1
+            if method is not None and method_name not in getattr(instance, '__dict__', ()):
+                return method(instance, *[arg() for arg in args])
+
+            method = getattr(instance, method_name, None)
+            values = [arg() for arg in args]
+            if method_name == '$get':
+                try:
+                    return instance[values[0]]
+                except:
+                    raise TypeException(f"'{method_name}' is not a method of {type(instance).__name__}", node.location)
+            if not callable(method):
+                raise TypeException(f"'{method_name}' is not a method of {type(instance).__name__}", node.location)
+            return method(*values)
+        return method_call
+
+    def compile_PropertyAccess(self, node):
+        obj, prop = self.compile(node.obj), node.prop
+        cache = node.cache or inline_cache(node); entries, store = cache.entries, cache.store
+        def property_access():
+            instance = obj()
+            if instance.__class__ is InstanceObject:
+                shape = instance.shape
+                index = entries.get(shape, MISSING)
+                if index is MISSING: index = store(shape, shape.names.get(prop))
+                else: cache.hits += 1
+                return instance.values[index] if index is not None else instance.lookup(prop, node)
+
+            klass = instance.__class__
+            getter = entries.get(klass, MISSING)
+            if getter is MISSING: getter = store(klass, native_property(klass, prop))
+            else: cache.hits += 1
+            try: value = getattr(instance, prop, None) if getter is None else getter(instance, klass)
+            except AttributeError: value = None
+            if value is None:
+                raise TypeException(f"'{prop}' is not a property of {type(instance).__name__}", node.location)
+            return value
+        return property_access
+
+    def compile_PropertyAssignment(self, node):
+        obj, prop, value = self.compile(node.obj), node.prop, self.compile(node.value)
+        def property_assignment():
+            instance = obj()
+            if not isinstance(instance, InstanceObject): raise TypeException(f"Cannot set property on a non-object.", node.location)
+            result = value()
+            index = instance.shape.writable.get(prop)
+            if index is None: return instance.assign(prop, result, node)
+            instance.values[index] = result; return result
+        return property_assignment
+
+    def compile_PropertyDeclaration(self, node):
+        obj, prop, value = self.compile(node.obj), node.prop, self.compile(node.value)
+        def property_declaration():
+            instance = obj()
+            if not isinstance(instance, InstanceObject): raise TypeException(f"Cannot declare property on a non-object.", node.location)
+            return instance.declare(prop, value(), node)
+        return property_declaration
+
+
+def interpret(ast, modules=None, environment=None):
+    return ClosureInterpreter(modules, environment).interpret(ast)
@@ -0,0 +1,53 @@
+import json
+import os
+import signal
+import socketserver
+import sys
+from Batch import WorkerPool
+
+# Resident interpreter service (--daemon SOCKET). Warm worker processes (Batch.WorkerPool) run
+# requests that arrive as one JSON object per line on a Unix domain socket:
+#   {"source": "...", "cwd": "...", "timeout": 5}   or   {"file": "/abs/path.py++", ...}
+# and answer with one JSON line {"status", "output", "result", "seconds", "worker"}. Each request
+# gets a fresh interpreter and global environment in a worker that runs nothing else meanwhile;
+# one that is still running after its timeout is killed and replaced, and the reply has status
+# 124. A worker that dies instead is replaced too, and the reply carries its exit status.
+# A worker keeps the parsed and resolved ASTs of the .py++ files requests include, but every
+# request executes them again in a registry of its own, so library globals start over each time.
+# Client.py is the matching client.
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, engine='tree', workers=None, timeout=30.0, cache=True, optimize=False, vectorize=False):
+        self.timeout_limit = timeout
+        self.pool = WorkerPool(workers or os.cpu_count() or 1, (engine, cache, optimize, vectorize))
+        if os.path.exists(path): os.remove(path)  # a socket left over from a daemon that was killed
+        super().__init__(path, Handler)
+
+    def handle_request_json(self, request):
+        timeout = min(float(request.get('timeout') or self.timeout_limit), self.timeout_limit)
+        return self.pool.run(request, timeout)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+        if os.path.exists(self.server_address): os.remove(self.server_address)
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.handle_request_json(json.loads(line))
+            except (ValueError, AttributeError) as e:
+                reply = {'status': 2, 'output': f"Bad request: {e}\n", 'result': None, 'seconds': 0.0}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+def serve(path, **options):
+    signal.signal(signal.SIGTERM, lambda number, frame: sys.exit(0))  # stop like on Ctrl-C: workers and socket cleaned up
+    with Daemon(path, **options) as daemon:
+        print(f"Serving on {path}", flush=True)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,122 @@
+from ASTNodes import *
+from Runtime import BINARY_OPS
+
+# Optional AST pass run between AST.to_ast and execution (-O). It only rewrites what it can prove
+# behaves the same at runtime: operations on literals that evaluate cleanly are folded, branches
+# and loops behind a literal condition are dropped, and 'x++' / 'x += n' / 'x = x - n' become a
+# single Increment node instead of an Assignment wrapping a BinaryOp and a fresh Number.
+# Increments always use the scalar '+' / '-', so with --vectorize they are left as BinaryOps.
+
+LITERALS = (Number, Float, String, BooleanLiteral, NullLiteral)
+MAX_FOLDED_STRING = 4096
+
+def literal(value, location):
+    if isinstance(value, bool): return BooleanLiteral(value, location)
+    if isinstance(value, int): return Number(value, location)
+    if isinstance(value, float): return Float(value, location)
+    if isinstance(value, str) and len(value) <= MAX_FOLDED_STRING: return String(value, location)
+    if value is None: return NullLiteral(location)
+    return None
+
+def literal_value(node): return None if isinstance(node, NullLiteral) else node.value
+
+class Optimizer:
+    def __init__(self, collapse_increments=True):
+        self.folded = self.pruned = self.increments = 0
+        self.collapse_increments = collapse_increments
+
+    def optimize_program(self, ast_nodes):
+        return self.statements(ast_nodes)
+
+    def optimize(self, node):
+        optimizer = getattr(self, f"optimize_{type(node).__name__}", None)
+        return optimizer(node) if optimizer else node
+
+    def statements(self, statements):
+        optimized = []
+        for stmt in statements:
+            stmt = self.optimize(stmt)
+            if stmt is not None: optimized.append(stmt)
+        return optimized
+
+    def optimize_BinaryOp(self, node):
+        node.left, node.right = self.optimize(node.left), self.optimize(node.right)
+        func = BINARY_OPS.get(node.op)
+        if func is None or not isinstance(node.left, LITERALS) or not isinstance(node.right, LITERALS): return node
+        try:
+            value = func(literal_value(node.left), literal_value(node.right))
+            if value == 'undefined': return node  # keep the runtime TypeException
+        except Exception:
+            return node
+        folded = literal(value, node.location)
+        if folded is None: return node
+        self.folded += 1
+        return folded
+
+    def optimize_VarDeclaration(self, node):
+        node.value = self.optimize(node.value); return node
+
+    optimize_ConstDeclaration = optimize_ReturnStatement = optimize_VarDeclaration
+
+    def optimize_Assignment(self, node):
+        node.value = value = self.optimize(node.value)
+        if not self.collapse_increments or not isinstance(value, BinaryOp) or value.op not in ('+', '-') or value.location != node.location: return node
+        if isinstance(value.left, VarReference) and value.left.name == node.name and isinstance(value.right, (Number, Float)):
+            self.increments += 1
+            return Increment(value.left, value.op, value.right.value, node.location)
+        return node
+
+    def optimize_Block(self, node):
+        node.statements = self.statements(node.statements); return node
+
+    def optimize_IfStatement(self, node):
+        node.condition = self.optimize(node.condition)
+        node.then_block = self.optimize(node.then_block)
+        if node.else_block: node.else_block = self.optimize(node.else_block)
+        if not isinstance(node.condition, LITERALS): return node
+        self.pruned += 1
+        return node.then_block if literal_value(node.condition) else node.else_block
+
+    def optimize_WhileStatement(self, node):
+        node.condition = self.optimize(node.condition)
+        if isinstance(node.condition, LITERALS) and not literal_value(node.condition):
+            self.pruned += 1
+            return None
+        node.block = self.optimize(node.block); return node
+
+    def optimize_ForStatement(self, node):
+        if node.init: node.init = self.optimize(node.init)
+        if node.condition:
+            node.condition = self.optimize(node.condition)
+            if isinstance(node.condition, LITERALS) and not literal_value(node.condition):
+                self.pruned += 1
+                return node.init
+        if node.update: node.update = self.optimize(node.update)
+        node.block = self.optimize(node.block); return node
+
+    def optimize_FunctionDeclaration(self, node):
+        node.block = self.optimize(node.block); return node
+
+    def optimize_ClassDeclaration(self, node):
+        node.methods = [self.optimize(method) for method in node.methods]; return node
+
+    def optimize_FunctionCall(self, node):
+        node.args = [self.optimize(arg) for arg in node.args]; return node
+
+    optimize_ClassInstance = optimize_FunctionCall
+
+    def optimize_MethodCall(self, node):
+        node.obj = self.optimize(node.obj)
+        node.args = [self.optimize(arg) for arg in node.args]; return node
+
+    def optimize_PropertyAccess(self, node):
+        node.obj = self.optimize(node.obj); return node
+
+    def optimize_PropertyAssignment(self, node):
+        node.obj, node.value = self.optimize(node.obj), self.optimize(node.value); return node
+
+    optimize_PropertyDeclaration = optimize_PropertyAssignment
+
+
+def optimize(ast, collapse_increments=True):
+    return Optimizer(collapse_increments).optimize_program(ast)
@@ -0,0 +1,59 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from standard import List
+from Runtime import ClassObject
+from Closures import ClosureInterpreter
+
+# parallel_map(function, items, workers) for Py++, exposed by 'standard'. The function (its
+# FunctionDeclaration and the environment it closes over) is pickled once and each worker
+# process unpickles it and runs it with its own ClosureInterpreter. Items go out in chunks
+# (several per worker, so uneven items still balance) and results come back in order.
+#
+# Everything runs in this process instead when the function, the items or a result cannot be
+# pickled, or when there is a single worker or item. Workers get copies: a function that changes
+# variables it captured only changes its worker's copy, so parallel_map is meant for pure functions.
+
+CHUNKS_PER_WORKER = 4
+UNPICKLABLE = (pickle.PicklingError, TypeError, AttributeError, RecursionError)
+
+worker = None  # (interpreter, function) in a worker process, set by start_worker
+
+def start_worker(payload):
+    global worker
+    worker = ClosureInterpreter(), pickle.loads(payload)
+
+def run_chunk(chunk):
+    # Errors raised by the function propagate to parallel_map; None only means a result did not pickle
+    interpreter, function = worker
+    results = [interpreter.call(None, function, [item]) for item in pickle.loads(chunk)]
+    try:
+        return pickle.dumps(results, pickle.HIGHEST_PROTOCOL)
+    except UNPICKLABLE:
+        return None
+
+def run_parallel(function, items, workers):
+    try:
+        payload = pickle.dumps(function, pickle.HIGHEST_PROTOCOL)
+        size = -(-len(items) // (workers * CHUNKS_PER_WORKER))
+        chunks = [pickle.dumps(items[start:start + size], pickle.HIGHEST_PROTOCOL) for start in range(0, len(items), size)]
+    except UNPICKLABLE:
+        return None
+    with ProcessPoolExecutor(workers, initializer=start_worker, initargs=(payload,)) as pool:
+        chunks = list(pool.map(run_chunk, chunks))
+    if any(chunk is None for chunk in chunks): return None  # a result that does not pickle; the serial run below returns it as is
+    try:
+        return [result for chunk in chunks for result in pickle.loads(chunk)]
+    except UNPICKLABLE:
+        return None
+
+def parallel_map(function, items, workers=None):
+    if isinstance(function, ClassObject) or not callable(function) and not hasattr(function, 'declaration'):
+        raise TypeError(f"parallel_map expects a function, not {function!r}")
+    items = items.list if isinstance(items, List) else list(items)
+    workers = min(int(workers or os.cpu_count() or 1), len(items))
+    if workers > 1:
+        results = run_parallel(function, items, workers)
+        if results is not None: return List(*results)
+    interpreter = ClosureInterpreter()
+    return List(*[interpreter.call(None, function, [item]) for item in items])
@@ -0,0 +1,185 @@
+import os
+import time
+from ASTNodes import *
+from Runtime import Interpreter, InstanceObject
+from Bytecode import Compiler, LINE_START, LINE_END
+from Closures import ClosureInterpreter
+from VM import VirtualMachine
+
+# Deterministic profiler for Py++ programs (--profile). Nothing here is imported or run unless
+# profiling is requested: profiled() derives a subclass of the chosen engine that times every
+# user function call and every statement, keyed by the node locations the parser recorded.
+#
+# Function self time excludes nested calls, line self time excludes nested statements, and total
+# time is only counted for the outermost active frame so recursion is not counted twice. Lines are
+# keyed by file as well, so included files do not mix with the program. 'return f(...)' runs f in
+# its caller's frame (a tail call), so that frame is closed for the caller and reopened for f.
+
+def find_statements(nodes, found, file):
+    # Only nodes in statement position get a line frame, so 'let x = f()' counts one hit, not two
+    for node in nodes:
+        if not isinstance(node, Block): found[node] = file
+        for child in child_nodes(node):
+            if isinstance(child, Block): find_statements(child.statements, found, file)
+            elif isinstance(node, ForStatement) and child in (node.init, node.update): find_statements([child], found, file)
+            else: find_statements_in(child, found, file)
+    return found
+
+def find_statements_in(node, found, file):
+    for child in child_nodes(node):
+        if isinstance(child, Block): find_statements(child.statements, found, file)
+        else: find_statements_in(child, found, file)
+
+class Profiler:
+    def __init__(self, clock=time.perf_counter, program='<program>'):
+        self.clock, self.program = clock, program
+        self.functions, self.lines, self.stacks = {}, {}, {}  # name / (name, file, line) -> [calls, total, self]
+        self.calls = ['<program>']                             # function names, innermost last
+        self.call_frames, self.line_frames = [], []            # [start, time in nested frames of the same kind]
+        self.active, self.statements = {}, {}                  # statement node -> file
+
+    def enter(self, frames, key):
+        self.active[key] = self.active.get(key, 0) + 1
+        frames.append([self.clock(), 0.0])
+
+    def leave(self, frames, table, key):
+        start, nested = frames.pop()
+        elapsed = self.clock() - start
+        if frames: frames[-1][1] += elapsed
+        stats = table.get(key)
+        if stats is None: stats = table[key] = [0, 0.0, 0.0]
+        stats[0] += 1; stats[2] += elapsed - nested
+        self.active[key] -= 1
+        if not self.active[key]: stats[1] += elapsed
+        return elapsed - nested
+
+    def enter_function(self, name):
+        self.calls.append(name); self.enter(self.call_frames, name)
+
+    def leave_function(self):
+        own = self.leave(self.call_frames, self.functions, self.calls[-1])
+        stack = ';'.join(self.calls)
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + own
+        self.calls.pop()
+
+    def enter_line(self, file, line):
+        self.enter(self.line_frames, (self.calls[-1], file, line))
+
+    def leave_line(self, file, line):
+        self.leave(self.line_frames, self.lines, (self.calls[-1], file, line))
+
+    def report(self, limit=20):
+        lines = [f"{'calls':>9} {'total ms':>10} {'self ms':>10}  function"]
+        for name, (calls, total, own) in sorted(self.functions.items(), key=lambda item: -item[1][2])[:limit]:
+            lines.append(f"{calls:>9} {total * 1000:>10.2f} {own * 1000:>10.2f}  {name}")
+        lines.append('')
+        lines.append(f"{'hits':>9} {'total ms':>10} {'self ms':>10}  line")
+        for (name, file, line), (hits, total, own) in sorted(self.lines.items(), key=lambda item: -item[1][2])[:limit]:
+            lines.append(f"{hits:>9} {total * 1000:>10.2f} {own * 1000:>10.2f}  {file}:{line} ({name})")
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        # 'frame;frame;frame count' per line, in microseconds, as flamegraph.pl and speedscope read it
+        return '\n'.join(f"{stack} {round(own * 1e6)}" for stack, own in sorted(self.stacks.items()) if round(own * 1e6))
+
+def line_of(node):
+    # The line a statement starts on: node.location is its last token, the closing brace of a
+    # multi-line if, while, for, define or class
+    location = getattr(node, 'start', node.location)
+    return unpack_location(location)[1] if location is not None else 0
+
+class ProfilingMixin:
+    profiler = None
+
+    def interpret(self, ast_nodes):
+        # An include runs on an interpreter of its own while the registry is loading it
+        file = os.path.relpath(self.modules.loading[-1]) if self.modules.loading else self.profiler.program
+        find_statements(ast_nodes, self.profiler.statements, file)
+        self.profiler.enter(self.profiler.call_frames, '<program>')
+        try:
+            return super().interpret(ast_nodes)
+        finally:
+            own = self.profiler.leave(self.profiler.call_frames, self.profiler.functions, '<program>')
+            self.profiler.stacks['<program>'] = self.profiler.stacks.get('<program>', 0.0) + own
+
+    def execute_function(self, user_func, args, node, self_env=None):
+        name = user_func.declaration.name
+        if self_env.__class__ is InstanceObject: name = f"{self_env.klass.name}.{name}"
+        self.profiler.enter_function(name)
+        try:
+            return super().execute_function(user_func, args, node, self_env)
+        finally:
+            self.profiler.leave_function()
+
+    def execute_body(self, func_decl):
+        result = super().execute_body(func_decl)
+        if self.tail_call is not None:
+            # execute_function runs the callee next in this same frame, so the frame is the callee's from here on
+            self.profiler.leave_function(); self.profiler.enter_function(self.tail_call[0].declaration.name)
+        return result
+
+class ProfilingInterpreter(ProfilingMixin, Interpreter):
+    def visit(self, node, **kwargs):
+        file = self.profiler.statements.get(node)
+        if file is None: return super().visit(node, **kwargs)
+        line = line_of(node); self.profiler.enter_line(file, line)
+        try:
+            return super().visit(node, **kwargs)
+        finally:
+            self.profiler.leave_line(file, line)
+
+class ProfilingClosureInterpreter(ProfilingMixin, ClosureInterpreter):
+    def compile(self, node):
+        compiled = super().compile(node)
+        file = self.profiler.statements.get(node)
+        if file is None: return compiled
+        profiler, line = self.profiler, line_of(node)
+        def statement():
+            profiler.enter_line(file, line)
+            try:
+                return compiled()
+            finally:
+                profiler.leave_line(file, line)
+        return statement
+
+class ProfilingCompiler(Compiler):
+    # Brackets every statement with LINE_START / LINE_END, which only ProfilingVirtualMachine handles
+    def __init__(self, statements):
+        super().__init__()
+        self.statements = statements
+
+    def statement(self, node, keep=False):
+        if node not in self.statements: return super().statement(node, keep)
+        self.code.emit(LINE_START, line_of(node), node)
+        super().statement(node, keep)
+        self.code.emit(LINE_END, line_of(node), node)
+
+class ProfilingVirtualMachine(ProfilingMixin, VirtualMachine):
+    def __init__(self, compiler=None, modules=None, environment=None):
+        super().__init__(compiler or ProfilingCompiler(self.profiler.statements), modules, environment)
+        self.open_lines = []
+
+    def line_start(self, node):
+        key = self.profiler.statements[node], line_of(node)
+        self.open_lines.append(key); self.profiler.enter_line(*key)
+
+    def line_end(self, node):
+        self.profiler.leave_line(*self.open_lines.pop())
+
+    def run(self, code):
+        # A return or an error leaves the statements it happened in without reaching their LINE_END
+        depth = len(self.open_lines)
+        try:
+            return super().run(code)
+        finally:
+            while len(self.open_lines) > depth: self.line_end(None)
+
+ENGINES = {'tree': ProfilingInterpreter, 'closure': ProfilingClosureInterpreter, 'vm': ProfilingVirtualMachine}
+
+def profiled(engine, profiler):
+    # A subclass carrying the profiler, so the interpreters ModuleRegistry creates for includes share it
+    return type(ENGINES[engine].__name__, (ENGINES[engine],), {'profiler': profiler})
+
+def interpret(ast, engine='tree', modules=None, profiler=None, program='<program>'):
+    profiler = profiler or Profiler(program=program)
+    return profiled(engine, profiler)(modules=modules).interpret(ast), profiler
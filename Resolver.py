@@ -0,0 +1,149 @@
+from ASTNodes import *
+
+# Static resolution pass run between Parser.parse and execution. Every block and function body
+# gets a Scope with a fixed slot layout, and every name reference, assignment and declaration
+# inside one is annotated with (depth, slot) so the runtime can index a SlotEnvironment instead
+# of hashing its way up the parent chain.
+#
+#   depth is None             -> resolve by name at runtime (methods, includes, late declarations)
+#   depth = n, slot is None   -> the global environment, n parents up
+#   depth = n, slot = s       -> slot s of the environment n parents up
+
+class Scope:
+    def __init__(self):
+        self.slots, self.constants, self.dynamic, self.size = {}, set(), False, 0
+
+    def add(self, name, is_constant=False):
+        if name not in self.slots:
+            self.slots[name] = self.size; self.size += 1
+            if is_constant: self.constants.add(name)
+
+    def __repr__(self): return f"Scope({', '.join(self.slots)})"
+
+class Resolver:
+    def __init__(self):
+        self.scopes = []  # (Scope, names declared so far), innermost last
+        self.base = 0     # index of the first scope visible from the current method body
+
+    def resolve_program(self, ast_nodes):
+        for node in ast_nodes: self.resolve(node)
+        return ast_nodes
+
+    def resolve(self, node):
+        resolver = getattr(self, f"resolve_{type(node).__name__}", None)
+        if resolver: resolver(node)
+
+    def hoist(self, scope, statements):
+        for stmt in statements:
+            if isinstance(stmt, ForStatement): stmt = stmt.init
+            if isinstance(stmt, (VarDeclaration, FunctionDeclaration, ClassDeclaration)): scope.add(stmt.name)
+            elif isinstance(stmt, ConstDeclaration): scope.add(stmt.name, is_constant=True)
+            elif isinstance(stmt, Include): scope.dynamic = True
+        return scope
+
+    def push(self, scope, declared=()):
+        self.scopes.append((scope, set(declared)))
+
+    def lookup(self, name):
+        visible = self.scopes[self.base:]
+        for depth, (scope, declared) in enumerate(reversed(visible)):
+            if scope.dynamic: return None, None, False
+            if name in declared: return depth, scope.slots[name], name in scope.constants
+            if name in scope.slots: return None, None, False  # declared later in this scope, not bound yet
+        if self.base: return None, None, False  # method bodies fall through to the instance environment
+        return len(visible), None, False
+
+    def bind(self, node, name):
+        node.depth, node.slot, constant = self.lookup(name)
+        return constant
+
+    def declare(self, node):
+        if not self.scopes: return
+        scope, declared = self.scopes[-1]
+        if not scope.dynamic: node.slot = scope.slots[node.name]
+        declared.add(node.name)
+
+    def resolve_VarReference(self, node): self.bind(node, node.name)
+
+    def resolve_BinaryOp(self, node):
+        self.resolve(node.left); self.resolve(node.right)
+
+    def resolve_VarDeclaration(self, node):
+        self.resolve(node.value); self.declare(node)
+
+    resolve_ConstDeclaration = resolve_VarDeclaration
+
+    def resolve_Assignment(self, node):
+        self.resolve(node.value); node.constant = self.bind(node, node.name)
+
+    def resolve_Increment(self, node):
+        self.resolve(node.target); node.constant = self.bind(node, node.target.name)
+
+    def resolve_ReturnStatement(self, node): self.resolve(node.value)
+
+    def resolve_Block(self, node):
+        scope = self.hoist(Scope(), node.statements)
+        if not scope.size and not scope.dynamic:
+            # Nothing to declare: run in the enclosing scope, which also keeps this block out of the depth count
+            node.inline = True
+            for stmt in node.statements: self.resolve(stmt)
+            return
+        node.scope = None if scope.dynamic else scope
+        self.push(scope)
+        for stmt in node.statements: self.resolve(stmt)
+        self.scopes.pop()
+
+    def resolve_IfStatement(self, node):
+        self.resolve(node.condition); self.resolve(node.then_block)
+        if node.else_block: self.resolve(node.else_block)
+
+    def resolve_WhileStatement(self, node):
+        self.resolve(node.condition); self.resolve(node.block)
+
+    def resolve_ForStatement(self, node):
+        for child in (node.init, node.condition, node.block, node.update):
+            if child: self.resolve(child)
+
+    def resolve_FunctionDeclaration(self, node, method=False):
+        if not method: self.declare(node)
+        scope, params = Scope(), [param.name for param in node.params.params]
+        if method: scope.add('this', is_constant=True); params.append('this')
+        for name in params: scope.add(name)
+        self.hoist(scope, node.block.statements)
+        node.scope = None if scope.dynamic else scope
+
+        base = self.base
+        if method: self.base = len(self.scopes)
+        self.push(scope, params)
+        for stmt in node.block.statements: self.resolve(stmt)
+        self.scopes.pop(); self.base = base
+
+    def resolve_ClassDeclaration(self, node):
+        self.declare(node)
+        for method in node.methods: self.resolve_FunctionDeclaration(method, method=True)
+
+    def resolve_FunctionCall(self, node):
+        self.bind(node, node.name)
+        for arg in node.args: self.resolve(arg)
+
+    def resolve_ClassInstance(self, node):
+        self.bind(node, node.class_name)
+        for arg in node.args: self.resolve(arg)
+
+    def resolve_MethodCall(self, node):
+        self.resolve(node.obj)
+        for arg in node.args: self.resolve(arg)
+
+    def resolve_PropertyAccess(self, node): self.resolve(node.obj)
+
+    def resolve_PropertyAssignment(self, node):
+        self.resolve(node.obj); self.resolve(node.value)
+
+    resolve_PropertyDeclaration = resolve_PropertyAssignment
+
+    def resolve_MetadataFlag(self, node):
+        if isinstance(node.value, ASTNode): self.resolve(node.value)
+
+
+def resolve(ast):
+    return Resolver().resolve_program(ast)
@@ -1,10 +1,45 @@
+import importlib
+import operator
+import os
+import weakref
+from collections import OrderedDict
 from ASTNodes import *
-from types import FunctionType
-
-class ReturnValue(Exception):
-    def __init__(self, value): self.value = value
+from types import FunctionType, MethodDescriptorType, WrapperDescriptorType
+from standard import Array, List, kind
+
+# Returned by statements once a 'return' has run, so blocks and loops stop and the enclosing
+# execute_function picks up interpreter.return_value (or interpreter.tail_call) without unwinding.
+RETURN = object()
+
+def divide(x, y):
+    if y != 0 and x != 0: return x / y
+    raise ZeroDivisionError  # 0 / y is 'undefined' too
+
+# Bound once at import time; BinaryOp nodes keep a reference to their function in node.func so
+# evaluating one is a single call. Any exception, or a result of 'undefined', is a TypeException.
+BINARY_OPS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": divide,
+    ">": operator.gt,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+
+def operator_error(node, a, b):
+    return TypeException(f"The expression '{a.__repr__()} {node.op} {b.__repr__()}' is not possible", node.location)
+
+def bind_operator(node):
+    func = node.func = BINARY_OPS.get(node.op)
+    if func is None: raise TypeException(f"Unknown operator '{node.op}'", node.location)
+    return func
 
 class Environment:
+    captured = False  # see capture()
     def __init__(self, parent=None):
         self.vars, self.parent = {}, parent
     def declare(self, name, value, node, is_constant=False):
@@ -14,9 +49,9 @@ class Environment:
     def assign(self, name, value, node):
         if name in self.vars:
             _, is_const = self.vars[name]
-            if is_const: raise TypeException(f"Cannot assign to constant '{name.value}'.", node.location)
+            if is_const: raise TypeException(f"Cannot assign to constant '{name}'.", node.location)
             self.vars[name] = (value, is_const); return value
-        if self.parent: return self.parent.assign(name, value)
+        if self.parent: return self.parent.assign(name, value, node)
         raise NameException(f"Variable '{name}' is not defined.", node.location)
 
     def lookup(self, name, node):
@@ -24,51 +59,402 @@ class Environment:
         if self.parent: return self.parent.lookup(name, node)
         raise NameException(f"Variable '{name}' is not defined.", node.location)
 
+    def ancestor(self, depth):
+        env = self
+        for _ in range(depth): env = env.parent
+        return env
+
     def __add__(self, other):
         merged = Environment()
         merged.vars = {**self.vars, **other.vars}
         return merged
 
+class Unset:
+    # A declared but not yet initialized slot. Pickles by name so copies (parallel_map) still see the singleton.
+    def __reduce__(self): return 'UNSET'
+    def __repr__(self): return 'UNSET'
+
+UNSET = Unset()
+
+class SlotEnvironment(Environment):
+    # Environment for a scope laid out by Resolver: values live in a flat list indexed by slot.
+    # Name-based access still works (through scope.slots) for code that was not resolved.
+    def __init__(self, scope, parent=None):
+        self.scope, self.slots, self.parent, self.vars = scope, [UNSET] * scope.size, parent, None
+
+    def declare_slot(self, slot, name, value, node):
+        if self.slots[slot] is not UNSET: raise NameException(f"Variable '{name}' already declared.", node.location)
+        self.slots[slot] = value; return value
+
+    def declare(self, name, value, node, is_constant=False):
+        slot = self.scope.slots.get(name)
+        if slot is not None: return self.declare_slot(slot, name, value, node)
+        if self.vars is None: self.vars = {}
+        return Environment.declare(self, name, value, node, is_constant)
+
+    def assign(self, name, value, node):
+        slot = self.scope.slots.get(name)
+        if slot is not None and self.slots[slot] is not UNSET:
+            if name in self.scope.constants: raise TypeException(f"Cannot assign to constant '{name}'.", node.location)
+            self.slots[slot] = value; return value
+        if self.vars and name in self.vars: return Environment.assign(self, name, value, node)
+        if self.parent: return self.parent.assign(name, value, node)
+        raise NameException(f"Variable '{name}' is not defined.", node.location)
+
+    def lookup(self, name, node):
+        slot = self.scope.slots.get(name)
+        if slot is not None and self.slots[slot] is not UNSET: return self.slots[slot]
+        if self.vars and name in self.vars: return self.vars[name][0]
+        if self.parent: return self.parent.lookup(name, node)
+        raise NameException(f"Variable '{name}' is not defined.", node.location)
+
+def scope_environment(scope, parent):
+    return Environment(parent=parent) if scope is None else SlotEnvironment(scope, parent)
+
+def capture(env):
+    # Marks env and its parents as referenced by a function or instance, so LoopScope never clears
+    # them. Stops at an InstanceObject (its parent was captured when it was created) or at an
+    # environment already marked, whose parents are then marked too.
+    while isinstance(env, Environment) and not env.captured:
+        env.captured = True
+        env = env.parent
+    return env
+
+class LoopScope:
+    # One SlotEnvironment per loop run, cleared for every iteration instead of allocated. When a
+    # function or instance created in the previous iteration holds on to it, directly or through
+    # a nested scope (see capture()), the iteration gets a fresh environment instead.
+    __slots__ = ('scope', 'parent', 'env', 'blank')
+    def __init__(self, scope, parent):
+        self.scope, self.parent, self.env, self.blank = scope, parent, None, [UNSET] * scope.size
+
+    def enter(self):
+        env = self.env
+        if env is None or env.captured: env = self.env = SlotEnvironment(self.scope, self.parent)
+        else: env.slots[:] = self.blank; env.vars = None
+        return env
+
+def loop_scope(block, parent):
+    return None if block.inline or block.scope is None else LoopScope(block.scope, parent)
+
 class UserDefinedFunction:
     def __init__(self, declaration, closure): self.declaration, self.closure = declaration, closure
     def __repr__(self): return f"<function {self.declaration.name}>"
 
+class CallerFunction:
+    # A builtin that needs the interpreter calling it and the call site (tasks.spawn): engines call
+    # it through call_from() with both, so it runs Py++ code on the same engine and errors keep
+    # their location. Called from Python code it gets neither.
+    __slots__ = ('function',)
+    def __init__(self, function): self.function = function
+    def __call__(self, *args): return self.function(None, None, *args)
+    def call_from(self, interpreter, node, args): return self.function(interpreter, node, *args)
+    def __repr__(self): return f"<builtin {self.function.__name__}>"
+
+CALLER_TYPES = {CallerFunction}  # callables the engines pass their interpreter and call node to
+
+def memo_key(value):
+    # Equal arguments give equal keys: Lists and array literals by their contents, Arrays by their
+    # bytes, instances (and anything else hashable) by identity. 1, 1.0 and true stay apart.
+    cls = value.__class__
+    if cls is int or cls is str or value is None: return value
+    if cls is float or cls is bool: return cls, value
+    if cls is List: return List, tuple(map(memo_key, value.list))
+    if cls is tuple: return tuple, tuple(map(memo_key, value))
+    if cls is Array: return Array, kind(value.data), bytes(value.data)
+    hash(value)  # unhashable values raise TypeError and the call is not cached
+    return value
+
+memoized_functions = weakref.WeakSet()
+
+class MemoizedFunction:
+    # A '$memoize'd define. Results are kept per argument key in an LRU of declaration.memoize
+    # entries (0: no limit). Engines call it through call_from() (see CALLER_TYPES) with their own
+    # interpreter and the call node, so errors inside keep their location; native code calling back
+    # into Py++ uses __call__ and the interpreter that defined it. Plain functions pay nothing.
+    # Py++ code can read the counters with f.stats() and empty the cache with f.clear().
+    def __init__(self, declaration, closure, interpreter):
+        self.function, self.interpreter = UserDefinedFunction(declaration, closure), interpreter
+        self.results, self.maxsize = OrderedDict(), declaration.memoize
+        self.hits = self.misses = self.evictions = self.uncached = 0
+        memoized_functions.add(self)
+
+    def __call__(self, *args): return self.call_from(self.interpreter, None, args)
+
+    def call_from(self, interpreter, node, args):
+        try:
+            key = tuple(map(memo_key, args))
+            result = self.results.get(key, MISSING)
+        except TypeError:
+            self.uncached += 1
+            return interpreter.execute_function(self.function, list(args), node)
+        if result is not MISSING:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return result
+        self.misses += 1
+        result = self.results[key] = interpreter.execute_function(self.function, list(args), node)
+        if self.maxsize and len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def stats(self):
+        return {'size': len(self.results), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'uncached': self.uncached}
+
+    def clear(self): self.results.clear()
+
+    def __reduce__(self):
+        # Interpreters do not pickle; a copy gets a fresh interpreter of the same engine and an empty cache
+        return memoized_copy, (self.function.declaration, self.function.closure, type(self.interpreter))
+
+    def __repr__(self): return f"<memoized function {self.function.declaration.name}>"
+
+def memoized_copy(declaration, closure, engine): return MemoizedFunction(declaration, closure, engine())
+
+CALLER_TYPES.add(MemoizedFunction)
+
+def user_function(declaration, closure, interpreter):
+    capture(closure)
+    if declaration.memoize is None: return UserDefinedFunction(declaration, closure)
+    return MemoizedFunction(declaration, closure, interpreter)
+
+def memo_stats():
+    functions = list(memoized_functions)
+    stats = {'functions': len(functions)}
+    for counter in ('hits', 'misses', 'evictions', 'uncached'): stats[counter] = sum(getattr(function, counter) for function in functions)
+    return stats
+
 class ClassObject:
     def __init__(self, name, methods):
         self.name = name; self.methods = {m.name: m for m in methods}
+        self.functions, self.shape = {}, Shape()
+
+    def method(self, name, node):
+        # Methods always run with the instance as self_env, so one function object per class will do
+        function = self.functions.get(name)
+        if function is None:
+            method = self.methods.get(name)
+            if not method: raise AttrException(f"'{self.name}' has no method '{name}'", node.location)
+            function = self.functions[name] = UserDefinedFunction(method, None)
+        return function
 
     def instantiate(self, interpreter, args, node):
         instance = InstanceObject(self, interpreter.environment, node)
         constructor = self.methods.get("$struct")
         if constructor:
-            # Bind the constructor method to the new instance and execute it
-            bound_constructor = UserDefinedFunction(constructor, instance.env)
-            interpreter.execute_function(bound_constructor, args, node, self_env=instance.env)
+            # Run the constructor with the new instance as its environment
+            interpreter.execute_function(self.method("$struct", node), args, node, self_env=instance)
         return instance
 
     def __repr__(self): return f"<class {self.name}>"
 
+class Shape:
+    # Property layout shared by instances of a class: name -> index into InstanceObject.values, in
+    # declaration order. Declaring a property moves the instance to a child shape; the transition
+    # is created once, so instances built the same way end up sharing one Shape.
+    __slots__ = ('names', 'writable', 'transitions')
+    def __init__(self, names=None, writable=None):
+        self.names, self.writable, self.transitions = names or {}, writable or {}, {}
+
+    def add(self, name, is_constant=False):
+        shape = self.transitions.get((name, is_constant))
+        if shape is None:
+            names = {**self.names, name: len(self.names)}
+            writable = self.writable if is_constant else {**self.writable, name: len(self.names)}
+            shape = self.transitions[(name, is_constant)] = Shape(names, writable)
+        return shape
+
+    def __repr__(self): return f"Shape({', '.join(self.names)})"
+
 class InstanceObject:
+    # An instance is its own method environment: properties are read as bare names inside methods,
+    # 'this' is the instance and anything else falls through to where the object was created.
+    __slots__ = ('klass', 'shape', 'values', 'parent')
     def __init__(self, klass, parent_env, node):
-        self.klass = klass; self.env = Environment(parent=parent_env)
-        self.env.declare("this", self, node.location, is_constant=True)
-
-    def get_method(self, name, node):
-        method = self.klass.methods.get(name)
-        if not method: raise AttrException(f"'{self.klass.name}' has no method '{name}'", node.location)
-        # Return a function bound to this instance's environment
-        return UserDefinedFunction(method, self.env)
+        self.klass, self.shape, self.values, self.parent = klass, klass.shape, [], parent_env
+        capture(parent_env)
+
+    @property
+    def env(self): return self
+
+    def declare(self, name, value, node, is_constant=False):
+        if name == "this" or name in self.shape.names: raise NameException(f"Variable '{name}' already declared.", node.location)
+        self.shape = self.shape.add(name, is_constant); self.values.append(value); return value
+
+    def assign(self, name, value, node):
+        index = self.shape.writable.get(name)
+        if index is not None: self.values[index] = value; return value
+        if name == "this" or name in self.shape.names: raise TypeException(f"Cannot assign to constant '{name}'.", node.location)
+        if self.parent: return self.parent.assign(name, value, node)
+        raise NameException(f"Variable '{name}' is not defined.", node.location)
+
+    def lookup(self, name, node):
+        index = self.shape.names.get(name)
+        if index is not None: return self.values[index]
+        if name == "this": return self
+        if self.parent: return self.parent.lookup(name, node)
+        raise NameException(f"Variable '{name}' is not defined.", node.location)
+
+    ancestor = Environment.ancestor
+
     def __repr__(self): return f"<{self.klass.name} instance>"
 
-class Interpreter:
+MISSING = object()
+POLYMORPHIC_LIMIT = 4
+METHOD_TYPES = (FunctionType, MethodDescriptorType, WrapperDescriptorType)
+inline_caches = weakref.WeakSet()  # live sites only; a finished program's AST is not kept around
+
+class InlineCache:
+    # Per-site cache for MethodCall and PropertyAccess, keyed by the receiver's ClassObject or
+    # Python type. Up to POLYMORPHIC_LIMIT receivers are remembered; past that the site is
+    # megamorphic and misses just do the full lookup.
+    __slots__ = ('entries', 'hits', 'misses', '__weakref__')
     def __init__(self):
-        self.environment = Environment()
+        self.entries, self.hits, self.misses = {}, 0, 0
+        inline_caches.add(self)
+
+    def store(self, key, value):
+        self.misses += 1
+        if len(self.entries) < POLYMORPHIC_LIMIT: self.entries[key] = value
+        return value
+
+def inline_cache(node):
+    cache = node.cache = InlineCache()
+    return cache
+
+def inline_cache_stats():
+    caches = list(inline_caches)
+    hits, misses = sum(cache.hits for cache in caches), sum(cache.misses for cache in caches)
+    megamorphic = sum(len(cache.entries) == POLYMORPHIC_LIMIT and cache.misses > POLYMORPHIC_LIMIT for cache in caches)
+    return {'sites': len(caches), 'hits': hits, 'misses': misses, 'megamorphic': megamorphic}
+
+def static_attribute(klass, name):
+    for base in klass.__mro__:
+        if name in base.__dict__: return base.__dict__[name]
+    return None
+
+def native_method(klass, name):
+    # A plain function on the type is the same for every instance that does not shadow it; anything
+    # else (modules, staticmethods, instance attributes) is looked up with getattr every time.
+    if issubclass(klass, type): return None  # class receivers resolve through their own MRO
+    method = static_attribute(klass, name)
+    return method if isinstance(method, METHOD_TYPES) else None
+
+def native_property(klass, name):
+    # Data descriptors (property, __slots__ members) win over the instance __dict__, so their getter can be kept
+    if issubclass(klass, type): return None
+    prop = static_attribute(klass, name)
+    return prop.__get__ if hasattr(type(prop), '__set__') and hasattr(type(prop), '__get__') else None
+
+class ModuleRegistry:
+    # Resolves every include path once and keeps the executed namespace of each module, so a
+    # library included from several files is only parsed and run the first time.
+    # sources, when given, outlives the registry: it maps a .py++ include to its prepared AST
+    # (pickled, with the file's mtime and size), so long-lived workers (Batch.py, Daemon.py) can
+    # give every job a fresh registry that re-executes its includes without parsing and resolving
+    # them again. Each job unpickles its own copy, so no inline cache or other node state carries over.
+    def __init__(self, optimize=False, vectorize=False, cache=True, sources=None):
+        self.modules, self.loading = {}, []
+        self.hits = self.misses = 0
+        self.optimize, self.vectorize, self.cache, self.sources = optimize, vectorize, cache, sources
+
+    def prepare(self, ast):
+        from Resolver import resolve
+        if self.optimize:
+            from Optimizer import optimize
+            ast = optimize(ast, collapse_increments=not self.vectorize)
+        if self.vectorize:
+            from Vector import vectorize
+            ast = vectorize(ast)
+        return resolve(ast)
+
+    def locate(self, path, node):
+        if path.endswith('.py++'):
+            if not os.path.exists(path): raise FileNotFoundException(f"Included file '{path}' not found.", node.location)
+            return 'py++', os.path.realpath(path)
+        if path.endswith('.py'): return 'py', path[:-3].replace('/', '.').replace('\\', '.')
+        if os.path.exists(path + '.py++'): return 'py++', os.path.realpath(path + '.py++')
+        module_path = path.replace('/', '.').replace('\\', '.')
+        import importlib.util  # only Python includes need it
+        try:
+            if importlib.util.find_spec(module_path) is not None: return 'py', module_path
+        except (ImportError, ValueError):
+            pass
+        raise ValueException(f"Unsupported include path: {path}", node.location)
+
+    def load(self, kind, path, interpreter, node):
+        namespace = self.modules.get(path)
+        if namespace is not None:
+            self.hits += 1
+            return namespace
+        if path in self.loading:
+            cycle = ' -> '.join(self.loading[self.loading.index(path):] + [path])
+            raise ImportException(f"Circular include: {cycle}", node.location)
+        self.misses += 1
+        self.loading.append(path)
+        try:
+            namespace = self.load_source(path, interpreter) if kind == 'py++' else self.load_python(path, node)
+        except PyPlusPlusException as e:
+            if e.file is None and kind == 'py++': e.file = path  # the innermost include raising it holds its location
+            raise
+        finally:
+            self.loading.pop()
+        self.modules[path] = namespace
+        return namespace
+
+    def load_source(self, path, interpreter):
+        _, env = type(interpreter)(modules=self).interpret(self.source_ast(path))
+        return env.vars
+
+    def source_ast(self, path):
+        if self.sources is not None:
+            import pickle
+            stat = os.stat(path)
+            key, entry = (stat.st_mtime_ns, stat.st_size), self.sources.get(path)
+            if entry is not None and entry[0] == key: return pickle.loads(entry[1])
+        if self.cache:
+            from Cache import load_ast
+            ast = load_ast(path)
+        else:
+            import AST
+            with open(path, 'r') as f: ast = AST.to_ast(f)
+        ast = self.prepare(ast)
+        if self.sources is not None:
+            try: self.sources[path] = key, pickle.dumps(ast, pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError, RecursionError): pass  # parsed again next time
+        return ast
+
+    def load_python(self, module_path, node):
+        try:
+            mod = importlib.import_module(module_path)
+        except ImportError as e:
+            raise ImportException(f"Could not import Python module '{module_path}': {e}", node.location)
+        if hasattr(mod, '__include__') and isinstance(mod.__include__, dict):
+            return {name: (value, True) for name, value in mod.__include__.items()}
+        return {name: (getattr(mod, name), True) for name in dir(mod) if not name.startswith('_')}
+
+    def stats(self): return {'modules': len(self.modules), 'hits': self.hits, 'misses': self.misses}
+
+class Interpreter:
+    def __init__(self, modules=None, environment=None):
+        self.environment = environment or Environment()  # Snapshot.py passes in restored globals
+        self.modules = modules or ModuleRegistry()
+        self.return_value = self.tail_call = None
 
     def interpret(self, ast_nodes):
         result = None
-        for node in ast_nodes: result = self.visit(node)
+        for node in ast_nodes:
+            result = self.visit(node)
+            if result is RETURN: return self.finish_return(), self.environment  # a top-level return ends the program
         return result, self.environment
 
+    def finish_return(self):
+        if self.tail_call is None: return self.return_value
+        callee, args, node = self.tail_call; self.tail_call = None
+        return self.execute_function(callee, args, node)
+
     def visit(self, node, **kwargs):
         method_name = f"visit_{type(node).__name__}"; visitor = getattr(self, method_name, self.generic_visit)
         return visitor(node, **kwargs)
@@ -89,138 +475,142 @@ class Interpreter:
 
     def visit_NullLiteral(self, node, **kwargs): return None
 
-    def visit_VarReference(self, node, **kwargs): return self.environment.lookup(node.name, node)
+    def lookup(self, node, name):
+        depth = node.depth
+        if depth is None: return self.environment.lookup(name, node)
+        env = self.environment
+        while depth: env = env.parent; depth -= 1
+        return env.lookup(name, node) if node.slot is None else env.slots[node.slot]
+
+    def declare(self, node, name, value, is_constant=False):
+        if node.slot is None: return self.environment.declare(name, value, node, is_constant)
+        return self.environment.declare_slot(node.slot, name, value, node)
+
+    def assign(self, node, name, value):
+        if node.slot is None: return (self.environment if node.depth is None else self.environment.ancestor(node.depth)).assign(name, value, node)
+        if node.constant: raise TypeException(f"Cannot assign to constant '{name}'.", node.location)
+        self.environment.ancestor(node.depth).slots[node.slot] = value; return value
+
+    def visit_VarReference(self, node, **kwargs): return self.lookup(node, node.name)
 
     def visit_BinaryOp(self, node, **kwargs):
         a, b = self.visit(node.left), self.visit(node.right)
-        op = node.op
-        location = node.location
-
-        def safe_op(func):
-            try:
-                if func(a, b) == 'undefined': raise ZeroDivisionError
-                return func(a, b)
-            except Exception:
-                raise TypeException(f"The expression '{a.__repr__()} {op} {b.__repr__()}' is not possible", location)
-
-        ops = {
-            "+": lambda x, y: x + y,
-            "-": lambda x, y: x - y,
-            "*": lambda x, y: x * y,
-            "/": lambda x, y: (x / y if y != 0 else float('inf')) if y != 0 and x != 0 else 'undefined',
-            ">": lambda x, y: x > y,
-            "<": lambda x, y: x < y,
-            "==": lambda x, y: x == y,
-            "!=": lambda x, y: x != y,
-            "<=": lambda x, y: x <= y,
-            ">=": lambda x, y: x >= y,
-        }
-
-        if op not in ops:
-            raise TypeException(f"Unknown operator '{op}'", location)
-
-        return safe_op(ops[op])
+        func = node.func or bind_operator(node)
+        try:
+            result = func(a, b)
+        except Exception:
+            raise operator_error(node, a, b)
+        if result.__class__ is str and result == 'undefined': raise operator_error(node, a, b)
+        return result
 
     def visit_Include(self, node, **kwargs):
-        import os
-
-        if node.path.endswith('.py++'):
-            # Handle custom py++ file
-            from interpreter import interpret_file  # You must define this
-            file = node.path
-            if not os.path.exists(file):
-                raise FileNotFoundException(f"Included file '{file}' not found.", node.location)
-            _, env = interpret_file(file)
-            self.environment += env  # merge included env
+        kind, path = self.modules.locate(node.path, node)
+        namespace = self.modules.load(kind, path, self, node)
+        if kind == 'py++':
+            self.environment.vars.update(namespace)  # like merging the included environment, but keeps the parent chain
             return
-
-
-        elif node.path.endswith('.py'):
-            import importlib
-
-            module_path = node.path.replace('.py', '').replace('/', '.').replace('\\', '.')
-            try:
-                mod = importlib.import_module(module_path)
-            except ImportError as e:
-                raise ImportException(f"Could not import Python module '{module_path}': {e}", node.location)
-            if hasattr(mod, '__include__') and isinstance(mod.__include__, dict):
-
-                for name, value in mod.__include__.items():
-                    self.environment.declare(name, value, node, is_constant=True)
-            else:
-                for name in dir(mod):
-                    if not name.startswith('_'):
-                        value = getattr(mod, name)
-                        self.environment.declare(name, value, node, is_constant=True)
-
-        else:
-            try:
-                return self.visit_Include(Include(node.path+'.py++', node.location), **kwargs)
-            except:
-                try:
-                    return self.visit_Include(Include(node.path+'.py', node.location), **kwargs)
-                except:
-                    try:
-                        return self.visit_Include(Include(node.path, node.location), **kwargs)
-                    except:
-                        raise ValueException(f"Unsupported include path: {node.path}", node.location)
+        for name, (value, _) in namespace.items():
+            if self.environment.vars.get(name, (None,))[0] is not value:
+                self.environment.declare(name, value, node, is_constant=True)
 
     def visit_VarDeclaration(self, node, **kwargs):
-        return self.environment.declare(node.name, self.visit(node.value), node,False)
+        return self.declare(node, node.name, self.visit(node.value), False)
 
     def visit_ConstDeclaration(self, node, **kwargs):
-        return self.environment.declare(node.name, self.visit(node.value), node,True)
+        return self.declare(node, node.name, self.visit(node.value), True)
 
     def visit_Assignment(self, node, **kwargs):
-        return self.environment.assign(node.name, self.visit(node.value), node)
+        return self.assign(node, node.name, self.visit(node.value))
+
+    def visit_Increment(self, node, **kwargs):
+        value, amount, op = self.visit(node.target), node.amount, node.op
+        try:
+            result = value + amount if op == '+' else value - amount
+        except Exception:
+            raise operator_error(node, value, amount)
+        if result.__class__ is str and result == 'undefined': raise operator_error(node, value, amount)
+        return self.assign(node, node.target.name, result)
 
     def visit_Block(self, node, create_new_scope=True, **kwargs):
-        if create_new_scope: self.environment = Environment(parent=self.environment)
+        if node.inline or not create_new_scope:
+            for stmt in node.statements:
+                if self.visit(stmt) is RETURN: return RETURN
+            return
+        self.environment = scope_environment(node.scope, self.environment)
+        try:
+            for stmt in node.statements:
+                if self.visit(stmt) is RETURN: return RETURN
+        finally:
+            self.environment = self.environment.parent
+
+    def visit_loop_body(self, block, loop):
+        if loop is None: return self.visit(block)
+        outer = self.environment; self.environment = loop.enter()
         try:
-            for stmt in node.statements: self.visit(stmt)
+            return self.visit_Block(block, create_new_scope=False)
         finally:
-            if create_new_scope: self.environment = self.environment.parent
+            self.environment = outer
     def visit_IfStatement(self, node, **kwargs):
         if self.visit(node.condition): return self.visit(node.then_block)
         elif node.else_block: return self.visit(node.else_block)
 
     def visit_WhileStatement(self, node, **kwargs):
-        while self.visit(node.condition): self.visit(node.block)
+        loop = loop_scope(node.block, self.environment)
+        while self.visit(node.condition):
+            if self.visit_loop_body(node.block, loop) is RETURN: return RETURN
 
     def visit_ForStatement(self, node, **kwargs):
         if node.init: self.visit(node.init)
+        loop = loop_scope(node.block, self.environment)
         while True:
             if node.condition and not self.visit(node.condition): break
-            self.visit(node.block)
+            if self.visit_loop_body(node.block, loop) is RETURN: return RETURN
             if node.update: self.visit(node.update)
     def visit_FunctionDeclaration(self, node, **kwargs):
-        return self.environment.declare(node.name, UserDefinedFunction(node, self.environment), True)
+        return self.declare(node, node.name, user_function(node, self.environment, self))
 
     def visit_FunctionCall(self, node, **kwargs):
-        callee = self.environment.lookup(node.name, node); args = [self.visit(arg) for arg in node.args]
+        return self.call(node, self.lookup(node, node.name), [self.visit(arg) for arg in node.args])
+
+    def call(self, node, callee, args):
         if isinstance(callee, UserDefinedFunction): return self.execute_function(callee, args, node)
         if isinstance(callee, ClassObject): return callee.instantiate(self, args, node)
         if isinstance(callee, FunctionType): return callee(*args)
+        if callee.__class__ in CALLER_TYPES: return callee.call_from(self, node, args)
         if callable(callee): return callee(*args)
         raise TypeException(f"'{node.name}' is not callable", node.location)
 
     def execute_function(self, user_func, args, node, self_env=None):
-        func_decl, func_env = user_func.declaration, Environment(parent=self_env or user_func.closure)
-        if self_env: func_env.declare("this", self_env.lookup("this", node), node, is_constant=True)
-        for param, arg in zip(func_decl.params.params, args): func_env.declare(param.name, node, arg)
-        prev_env = self.environment; self.environment = func_env
+        prev_env = self.environment
         try:
-            self.visit(func_decl.block, create_new_scope=False)
-        except ReturnValue as rv: return rv.value
+            while True:
+                func_decl = user_func.declaration; func_env = scope_environment(func_decl.scope, self_env or user_func.closure)
+                if self_env: func_env.declare("this", self_env.lookup("this", node), node, is_constant=True)
+                for param, arg in zip(func_decl.params.params, args): func_env.declare(param.name, arg, node)
+                self.environment = func_env
+                if self.execute_body(func_decl) is not RETURN: return None
+                if self.tail_call is None: return self.return_value
+                # 'return f(...)': run f in this frame instead of nesting another call
+                (user_func, args, node), self.tail_call, self_env = self.tail_call, None, None
         finally: self.environment = prev_env
 
-    def visit_ReturnStatement(self, node, **kwargs): raise ReturnValue(self.visit(node.value))
+    def execute_body(self, func_decl): return self.visit(func_decl.block, create_new_scope=False)
+
+    def visit_ReturnStatement(self, node, **kwargs):
+        value = node.value
+        if value.__class__ is FunctionCall:
+            callee, args = self.lookup(value, value.name), [self.visit(arg) for arg in value.args]
+            if callee.__class__ is UserDefinedFunction: self.tail_call = (callee, args, value)
+            else: self.return_value = self.call(value, callee, args)
+        else:
+            self.return_value = self.visit(value)
+        return RETURN
 
     def visit_ClassDeclaration(self, node, **kwargs):
-        self.environment.declare(node.name, ClassObject(node.name, node.methods), True)
+        self.declare(node, node.name, ClassObject(node.name, node.methods))
 
     def visit_ClassInstance(self, node, **kwargs):
-        klass = self.environment.lookup(node.class_name, node)
+        klass = self.lookup(node, node.class_name)
         args = [self.visit(arg) for arg in node.args]
 
         if isinstance(klass, ClassObject):
@@ -233,42 +623,67 @@ class Interpreter:
 
     def visit_MethodCall(self, node, **kwargs):
         instance = self.visit(node.obj)
-        if not isinstance(instance, InstanceObject):
-            method = getattr(instance, node.method, None)
+        cache = node.cache or inline_cache(node)
+        if instance.__class__ is InstanceObject:
+            klass = instance.klass
+            method = cache.entries.get(klass)
+            if method is None: method = cache.store(klass, klass.method(node.method, node))
+            else: cache.hits += 1
             args = [self.visit(arg) for arg in node.args]
-            if node.method == '$get':
-                try:
-                    return instance[args[0]]
-                except:
-                    raise TypeException(f"'{node.method}' is not a method of {type(instance).__name__}", node.location)
+            return self.execute_function(method, args, node, self_env=instance)
 
-            if not callable(method):
-                raise TypeException(f"'{node.method}' is not a method of {type(instance).__name__}", node.location)
-            return method(*args)
+        klass = instance.__class__
+        method = cache.entries.get(klass, MISSING)
+        if method is MISSING: method = cache.store(klass, native_method(klass, node.method))
+        else: cache.hits += 1
+        if method is not None and node.method not in getattr(instance, '__dict__', ()):
+            return method(instance, *[self.visit(arg) for arg in node.args])
 
-        method = instance.get_method(node.method, node)
+        method = getattr(instance, node.method, None)
         args = [self.visit(arg) for arg in node.args]
-        return self.execute_function(method, args, node, self_env=instance.env)
+        if node.method == '$get':
+            try:
+                return instance[args[0]]
+            except:
+                raise TypeException(f"'{node.method}' is not a method of {type(instance).__name__}", node.location)
+
+        if not callable(method):
+            raise TypeException(f"'{node.method}' is not a method of {type(instance).__name__}", node.location)
+        return method(*args)
 
     def visit_PropertyAccess(self, node, **kwargs):
         instance = self.visit(node.obj)
-        if not isinstance(instance, InstanceObject):
-            prop = getattr(instance, node.prop, None)
-            if prop is None:
-                raise TypeException(f"'{node.prop}' is not a property of {type(instance).__name__}", node.location)
-            return prop
-        return instance.env.lookup(node.prop, node)
+        cache = node.cache or inline_cache(node)
+        if instance.__class__ is InstanceObject:
+            shape = instance.shape
+            index = cache.entries.get(shape, MISSING)
+            if index is MISSING: index = cache.store(shape, shape.names.get(node.prop))
+            else: cache.hits += 1
+            return instance.values[index] if index is not None else instance.lookup(node.prop, node)
+
+        klass = instance.__class__
+        getter = cache.entries.get(klass, MISSING)
+        if getter is MISSING: getter = cache.store(klass, native_property(klass, node.prop))
+        else: cache.hits += 1
+        try: prop = getattr(instance, node.prop, None) if getter is None else getter(instance, klass)
+        except AttributeError: prop = None
+        if prop is None:
+            raise TypeException(f"'{node.prop}' is not a property of {type(instance).__name__}", node.location)
+        return prop
 
     def visit_PropertyAssignment(self, node, **kwargs):
         instance = self.visit(node.obj)
         if not isinstance(instance, InstanceObject): raise TypeException(f"Cannot set property on a non-object.", node.location)
-        return instance.env.assign(node.prop, self.visit(node.value), node)
+        value = self.visit(node.value)
+        index = instance.shape.writable.get(node.prop)
+        if index is None: return instance.assign(node.prop, value, node)
+        instance.values[index] = value; return value
 
     def visit_PropertyDeclaration(self, node, **kwargs):
         instance = self.visit(node.obj)
         if not isinstance(instance, InstanceObject): raise TypeException(f"Cannot declare property on a non-object.", node.location)
-        return instance.env.declare(node.prop, self.visit(node.value), node)
+        return instance.declare(node.prop, self.visit(node.value), node)
 
 
-def interpret(ast):
-    return Interpreter().interpret(ast)
+def interpret(ast, modules=None, environment=None):
+    return Interpreter(modules, environment).interpret(ast)
@@ -0,0 +1,139 @@
+import gc
+import io
+import os
+import pickle
+import sys
+import threading
+from ASTNodes import Include, VarDeclaration, ConstDeclaration, FunctionDeclaration, ClassDeclaration
+from Cache import source_key
+
+# Heap snapshots (--snapshot FILE). The leading top-level includes, lets, consts, defines and
+# classes of a program are its initialization: the first run executes them and pickles the
+# resulting global environment (functions with their closures, ClassObjects, instances, the
+# executed .py++ includes) to FILE. Later runs unpickle it and only execute the rest of the program.
+#
+# Values that come from a Python include (builtins of 'standard', native classes, ...) are stored
+# as a reference to the include and looked up again on restore, so they never need to pickle.
+# Anything else that does not pickle (an open file, a mapped file, a lock) is reported by the name
+# of the global holding it and the program runs without a snapshot. A snapshot is only used when
+# the program, every .py++ file it included, the -O / --vectorize flags and the parser and Python
+# versions are unchanged; otherwise it is rebuilt. Output printed during initialization is not
+# printed again by a restored run.
+
+INITIALIZERS = (Include, VarDeclaration, ConstDeclaration, FunctionDeclaration, ClassDeclaration)
+SCALARS = (int, float, bool, str, bytes, type(None))
+UNPICKLABLE = (pickle.PicklingError, TypeError, AttributeError, RecursionError)
+DEEP_STACK, DEEP_RECURSION = 128 << 20, 200000  # pickle uses ~220 bytes of stack per level and ~3 levels per linked instance
+
+def initialization(ast):
+    # How many statements at the start of the program only set up globals
+    count = 0
+    for node in ast:
+        if not isinstance(node, INITIALIZERS): break
+        count += 1
+    return count
+
+def native_values(modules):
+    # id -> (module, name) for every value of a Python include; the registry keeps them alive
+    return {id(value): (path, name) for path, namespace in modules.modules.items() if not path.endswith('.py++')
+            for name, (value, _) in namespace.items() if value.__class__ not in SCALARS}
+
+class SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, natives, placeholder=None):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.natives, self.placeholder = natives, placeholder
+
+    def persistent_id(self, obj):
+        if self.placeholder is not None and obj is self.placeholder: return 'placeholder'
+        return None if obj.__class__ in SCALARS else self.natives.get(id(obj))
+
+class SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, modules):
+        super().__init__(file)
+        self.modules = modules
+
+    def persistent_load(self, reference):
+        path, name = reference
+        namespace = self.modules.modules.get(path)
+        if namespace is None: namespace = self.modules.modules[path] = self.modules.load_python(path, None)
+        return namespace[name][0]
+
+def deep(function, *args):
+    # Pickling recurses once per object along a chain (a linked list of instances, a long closure
+    # chain), so it runs on a thread with a larger stack and a raised recursion limit, both restored
+    # afterwards. Deeper data raises RecursionError. Starting the thread raises RuntimeError when
+    # the stack cannot be had (a memory ulimit, say).
+    outcome, limit = [], sys.getrecursionlimit()
+    def run():
+        try: outcome.append((function(*args), None))
+        except BaseException as e: outcome.append((None, e))
+    size = threading.stack_size(DEEP_STACK)
+    try:
+        sys.setrecursionlimit(max(limit, DEEP_RECURSION))
+        thread = threading.Thread(target=run)
+        thread.start(); thread.join()
+    finally:
+        threading.stack_size(size); sys.setrecursionlimit(limit)
+    result, error = outcome[0]
+    if error is not None: raise error
+    return result
+
+def unpicklable(environment, natives):
+    # Pickles each global on its own, with the global environment left out, to find the ones to blame
+    for name, (value, _) in environment.vars.items():
+        try:
+            SnapshotPickler(io.BytesIO(), natives, environment).dump(value)
+        except UNPICKLABLE as e:
+            yield name, value, e
+
+def read_snapshot(path, key, modules):
+    enabled = gc.isenabled()
+    try:
+        with open(path, 'rb') as f:
+            stored, includes = pickle.load(f)
+            if stored != key or any(source_key(include) != include_key for include, include_key in includes): return None
+            gc.disable()  # see Cache.read_cache
+            environment, sources = SnapshotUnpickler(f, modules).load()
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError, KeyError):
+        return None
+    finally:
+        if enabled: gc.enable()
+    modules.modules.update(sources)  # later includes of the same files are cache hits, as in the first run
+    return environment
+
+def write_snapshot(path, key, environment, modules):
+    natives = native_values(modules)
+    sources = {include: namespace for include, namespace in modules.modules.items() if include.endswith('.py++')}
+    data = io.BytesIO()
+    try:
+        deep(SnapshotPickler(data, natives).dump, (environment, sources))
+    except UNPICKLABLE as e:
+        try: blamed = [f"'{name}' ({value!r}: {error})" for name, value, error in deep(list, unpicklable(environment, natives))]
+        except (RuntimeError, MemoryError): blamed = []
+        print(f"Snapshot not written, cannot save {', '.join(blamed) or e}", file=sys.stderr)
+        return False
+    except (RuntimeError, MemoryError) as e:
+        print(f"Snapshot not written: {e}", file=sys.stderr)
+        return False
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump((key, [(include, source_key(include)) for include in sources]), f, pickle.HIGHEST_PROTOCOL)
+            f.write(data.getbuffer())
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Snapshot not written: {e}", file=sys.stderr)
+        try: os.remove(tmp)
+        except OSError: pass
+        return False
+    return True
+
+def interpret(file, ast, run, modules, path):
+    # run is an engine's interpret(ast, modules, environment)
+    count = initialization(ast)
+    key = (source_key(file), modules.optimize, modules.vectorize, count)
+    environment = read_snapshot(path, key, modules)
+    if environment is None:
+        _, environment = run(ast[:count], modules)
+        write_snapshot(path, key, environment, modules)
+    return run(ast[count:], modules, environment)
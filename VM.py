@@ -0,0 +1,144 @@
+from ASTNodes import *
+from Runtime import BINARY_OPS, MISSING, RETURN, user_function, operator_error, inline_cache, native_property, Interpreter, Environment, UserDefinedFunction, ClassObject, InstanceObject, CALLER_TYPES
+from Bytecode import *
+from Vector import VECTOR_OPS
+
+OPERATOR_FUNCS = tuple(BINARY_OPS.values()) + tuple(VECTOR_OPS.values())  # see Compiler.compile_BinaryOp
+
+class VirtualMachine(Interpreter):
+    def __init__(self, compiler=None, modules=None, environment=None):
+        super().__init__(modules, environment)
+        self.compiler = compiler or Compiler()
+
+    def interpret(self, ast_nodes):
+        result = self.run(self.compiler.compile_program(ast_nodes))
+        if self.tail_call is not None: result = self.finish_return()
+        return result, self.environment
+
+    def execute_body(self, func_decl):
+        self.return_value = self.run(self.compiler.function(func_decl))
+        return RETURN
+
+    def run(self, code):
+        ops, args, locs, consts, names, nodes = code.ops, code.args, code.locs, code.consts, code.names, code.nodes
+        stack = []; push, pop = stack.append, stack.pop
+        pc = 0
+        while True:
+            op = ops[pc]; arg = args[pc]; pc += 1
+
+            if op == LOAD_NAME:
+                push(self.environment.lookup(names[arg], nodes[locs[pc - 1]]))
+            elif op == LOAD_CONST:
+                push(consts[arg])
+            elif op == BINARY_OP:
+                b = pop(); a = pop()
+                if arg < 0:
+                    node = nodes[locs[pc - 1]]
+                    raise TypeException(f"Unknown operator '{node.op}'", node.location)
+                try:
+                    result = OPERATOR_FUNCS[arg](a, b)
+                except Exception:
+                    raise operator_error(nodes[locs[pc - 1]], a, b)
+                if result.__class__ is str and result == 'undefined': raise operator_error(nodes[locs[pc - 1]], a, b)
+                push(result)
+            elif op == JUMP_IF_FALSE:
+                if not pop(): pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == POP_TOP:
+                pop()
+            elif op == ASSIGN_NAME:
+                self.environment.assign(names[arg], stack[-1], nodes[locs[pc - 1]])
+            elif op == PUSH_SCOPE:
+                self.environment = Environment(parent=self.environment)
+            elif op == POP_SCOPE:
+                self.environment = self.environment.parent
+            elif op == DECLARE_NAME or op == DECLARE_CONST:
+                self.environment.declare(names[arg], stack[-1], nodes[locs[pc - 1]], op == DECLARE_CONST)
+            elif op == CALL_FUNCTION:
+                node = nodes[locs[pc - 1]]
+                values = stack[len(stack) - arg:]; del stack[len(stack) - arg:]
+                callee = pop()
+                if isinstance(callee, UserDefinedFunction): push(self.execute_function(callee, values, node))
+                elif isinstance(callee, ClassObject): push(callee.instantiate(self, values, node))
+                elif callee.__class__ in CALLER_TYPES: push(callee.call_from(self, node, values))
+                elif callable(callee): push(callee(*values))
+                else: raise TypeException(f"'{node.name}' is not callable", node.location)
+            elif op == LOAD_METHOD:
+                instance = stack[-1]
+                if instance.__class__ is InstanceObject:
+                    node, klass = nodes[locs[pc - 1]], instance.klass
+                    cache = node.cache or inline_cache(node)
+                    method = cache.entries.get(klass)
+                    if method is None: method = cache.store(klass, klass.method(names[arg], node))
+                    else: cache.hits += 1
+                    push(method)
+                else: push(getattr(instance, names[arg], None))
+            elif op == CALL_METHOD:
+                node = nodes[locs[pc - 1]]
+                values = stack[len(stack) - arg:]; del stack[len(stack) - arg:]
+                method = pop(); instance = pop()
+                if isinstance(instance, InstanceObject):
+                    push(self.execute_function(method, values, node, self_env=instance))
+                elif node.method == '$get':
+                    try:
+                        push(instance[values[0]])
+                    except:
+                        raise TypeException(f"'{node.method}' is not a method of {type(instance).__name__}", node.location)
+                elif not callable(method):
+                    raise TypeException(f"'{node.method}' is not a method of {type(instance).__name__}", node.location)
+                else:
+                    push(method(*values))
+            elif op == LOAD_ATTR:
+                node, instance = nodes[locs[pc - 1]], pop()
+                if isinstance(instance, InstanceObject): push(instance.lookup(names[arg], node))
+                else:
+                    cache, klass = node.cache or inline_cache(node), instance.__class__
+                    getter = cache.entries.get(klass, MISSING)
+                    if getter is MISSING: getter = cache.store(klass, native_property(klass, names[arg]))
+                    else: cache.hits += 1
+                    try: value = getattr(instance, names[arg], None) if getter is None else getter(instance, klass)
+                    except AttributeError: value = None
+                    if value is None:
+                        raise TypeException(f"'{names[arg]}' is not a property of {type(instance).__name__}", node.location)
+                    push(value)
+            elif op == STORE_ATTR or op == DECLARE_ATTR:
+                node = nodes[locs[pc - 1]]
+                value = pop(); instance = pop()
+                if not isinstance(instance, InstanceObject):
+                    raise TypeException(f"Cannot {'set' if op == STORE_ATTR else 'declare'} property on a non-object.", node.location)
+                if op == STORE_ATTR: push(instance.assign(names[arg], value, node))
+                else: push(instance.declare(names[arg], value, node))
+            elif op == NEW_INSTANCE:
+                node = nodes[locs[pc - 1]]
+                values = stack[len(stack) - arg:]; del stack[len(stack) - arg:]
+                klass = pop()
+                if isinstance(klass, ClassObject): push(klass.instantiate(self, values, node))
+                elif isinstance(klass, type): push(klass(*values))
+                else: raise TypeError(f"'{node.class_name}' is not a class")
+            elif op == MAKE_FUNCTION:
+                decl = consts[arg]
+                push(self.environment.declare(decl.name, user_function(decl, self.environment, self), decl))
+            elif op == MAKE_CLASS:
+                decl = consts[arg]
+                self.environment.declare(decl.name, ClassObject(decl.name, decl.methods), decl)
+            elif op == RETURN_VALUE:
+                return pop()
+            elif op == TAIL_CALL:
+                node = nodes[locs[pc - 1]]
+                values = stack[len(stack) - arg:]; del stack[len(stack) - arg:]
+                callee = pop()
+                if callee.__class__ is UserDefinedFunction: self.tail_call = (callee, values, node); return None
+                return self.call(node, callee, values)
+            elif op == EVAL_NODE:
+                push(self.visit(consts[arg]))
+            elif op == LINE_START:  # only emitted by Profiler.ProfilingCompiler
+                self.line_start(nodes[locs[pc - 1]])
+            elif op == LINE_END:
+                self.line_end(nodes[locs[pc - 1]])
+            else:
+                raise RuntimeException(f"Unknown opcode {op}")
+
+
+def interpret(ast, modules=None, environment=None):
+    return VirtualMachine(modules=modules, environment=environment).interpret(ast)
@@ -0,0 +1,81 @@
+import operator
+from itertools import repeat
+from ASTNodes import *
+from Runtime import BINARY_OPS
+from standard import Array
+
+# Opt-in elementwise operators (--vectorize). vectorize() points every BinaryOp at a vector-aware
+# version of its operator: when either operand is an array literal, a standard.Array or a NumPy
+# array, the operation is applied to all elements at once (a number is broadcast against an
+# array), and comparisons give a boolean mask instead of a single bool. Everything else falls
+# through to the scalar operator, so only programs that mix arrays into arithmetic see a change.
+#
+# With NumPy installed the work is done by its kernels (an Array's buffer is shared, not copied)
+# and results are NumPy arrays. Without it, results are a standard.Array, and masks a tuple of
+# bools. Elementwise division is plain true division: x / 0 is an error, 0 / x is 0.
+
+ELEMENTWISE = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    ">": operator.gt,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+COMPARISONS = {">", "<", "==", "!=", "<=", ">="}
+
+numpy = None                   # imported on the first vector operation; False when it is not installed
+vector_types = {tuple, Array}  # gains numpy.ndarray once NumPy is loaded
+
+def load_numpy():
+    global numpy
+    try:
+        import numpy as np
+        vector_types.add(np.ndarray)
+    except ImportError:
+        np = False
+    numpy = np
+    return np
+
+def as_numpy(np, value):
+    # An Array's array.array or memoryview is wrapped without a copy; numbers are broadcast as they are
+    if value.__class__ is Array: return np.asarray(value.data)
+    return np.asarray(value) if value.__class__ is tuple else value
+
+def apply(op, a, b):
+    np = numpy if numpy is not None else load_numpy()
+    func = ELEMENTWISE[op]
+    if np:
+        with np.errstate(divide='raise', invalid='raise', over='raise'):
+            return func(as_numpy(np, a), as_numpy(np, b))
+    if a.__class__ in vector_types and b.__class__ in vector_types:
+        if len(a) != len(b): raise ValueError(f"Arrays of length {len(a)} and {len(b)} cannot be combined")
+        values = map(func, a, b)
+    elif a.__class__ in vector_types: values = map(func, a, repeat(b))
+    else: values = map(func, repeat(a), b)
+    return tuple(values) if op in COMPARISONS else Array(list(values))
+
+def vector_operator(op):
+    scalar = BINARY_OPS[op]
+    def operation(a, b):
+        if a.__class__ in vector_types or b.__class__ in vector_types: return apply(op, a, b)
+        return scalar(a, b)
+    operation.__name__ = operation.__qualname__ = f"vector_{scalar.__name__}"
+    return operation
+
+VECTOR_OPS = {op: vector_operator(op) for op in BINARY_OPS}
+# Module-level names (vector_add, vector_divide, ...) so pickle stores BinaryOp.func by reference:
+# --snapshot and parallel_map pickle vectorized ASTs
+for _operation in VECTOR_OPS.values(): globals()[_operation.__name__] = _operation
+
+def vectorize(ast_nodes):
+    nodes = list(ast_nodes)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, BinaryOp) and node.op in VECTOR_OPS: node.func = VECTOR_OPS[node.op]
+        nodes.extend(child_nodes(node))
+    return ast_nodes
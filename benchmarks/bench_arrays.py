@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+from Resolver import resolve
+from Closures import interpret
+
+# Doubles every element of a numeric sequence and sums the result, once with interpreted loops
+# over standard.List and once with standard.Array's elementwise operators and reductions. Both
+# build the same List first; that setup is timed on its own and subtracted.
+
+SETUP = """
+include 'standard'
+let xs = new list()
+for (let i = 0 : i < {n} : i++) {{ xs.append(i) }}
+let total = 0
+"""
+
+LOOP = """
+let doubled = new list()
+for (let j = 0 : j < {n} : j++) {{
+    let x = xs.get(j)
+    doubled.append(x * 2)
+}}
+for (let k = 0 : k < {n} : k++) {{
+    let y = doubled.get(k)
+    total = total + y
+}}
+"""
+
+ARRAY = """
+let values = new array(xs)
+let doubled = values * 2
+total = doubled.sum()
+"""
+
+def run(program, n):
+    ast = resolve(AST.to_ast(program.format(n=n)))
+    start = time.perf_counter()
+    _, env = interpret(ast)
+    return time.perf_counter() - start, env.lookup('total', None)
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    setup, _ = run(SETUP, n)
+    loop, loop_total = run(SETUP + LOOP, n)
+    vector, vector_total = run(SETUP + ARRAY, n)
+    assert loop_total == vector_total, (loop_total, vector_total)
+    print(f"{n} elements  loop {(loop - setup) * 1000:8.2f} ms  array {(vector - setup) * 1000:8.2f} ms")
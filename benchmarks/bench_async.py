@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+import Async
+from Resolver import resolve
+from Closures import interpret
+
+# Spawns tasks that each sleep and run a short subprocess, then gathers them: once blocking
+# (the tasks run one after another) and once on the --async runtime, where the waits overlap.
+
+PROGRAM = """
+include 'standard'
+include 'tasks'
+define job(i) {{
+    sleep({seconds})
+    return run("echo job")
+}}
+let started = new list()
+for (let i = 0 : i < {tasks} : i++) {{ started.append(spawn(job, i)) }}
+let results = gather(started)
+"""
+
+def bench(asynchronous, tasks=20, seconds=0.05):
+    ast = resolve(AST.to_ast(PROGRAM.format(tasks=tasks, seconds=seconds)))
+    start = time.perf_counter()
+    _, env = Async.interpret(ast, 'closure') if asynchronous else interpret(ast)
+    return time.perf_counter() - start, len(env.lookup('results', None))
+
+if __name__ == '__main__':
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    (blocking, count), (overlapped, async_count) = bench(False, tasks), bench(True, tasks)
+    assert count == async_count == tasks
+    print(f"{tasks} tasks  blocking {blocking * 1000:8.2f} ms  async {overlapped * 1000:8.2f} ms  x{blocking / overlapped:5.1f}")
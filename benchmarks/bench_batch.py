@@ -0,0 +1,38 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs the same set of small scripts once as one interpreter process per script and once with
+# --batch on warm workers, and reports jobs per second for both.
+
+SCRIPT = """
+include 'standard'
+let items = new list()
+for (let i = 0 : i < {n} : i++) {{ items.append(i * {n}) }}
+stdout(len(items))
+"""
+
+def timed(command):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    workers = sys.argv[2] if len(sys.argv) > 2 else str(os.cpu_count() or 1)
+    directory = tempfile.mkdtemp()
+    try:
+        scripts = []
+        for n in range(count):
+            scripts.append(os.path.join(directory, f"job{n}.py++"))
+            with open(scripts[-1], 'w') as f: f.write(SCRIPT.format(n=n))
+        single = sum(timed([sys.executable, 'interpreter.py', script, '--engine', 'closure']) for script in scripts)
+        batch = timed([sys.executable, 'interpreter.py', '--batch', directory, '--engine', 'closure', '--workers', workers])
+    finally:
+        shutil.rmtree(directory)
+    print(f"{count} scripts  one process each {count / single:7.1f} jobs/s  --batch ({workers} workers) {count / batch:7.1f} jobs/s")
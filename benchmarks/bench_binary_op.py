@@ -0,0 +1,72 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ASTNodes import *
+from Runtime import Interpreter
+from Closures import ClosureInterpreter
+
+# Evaluates one BinaryOp node over and over on each engine. 'legacy' is the dispatch this
+# replaced: an operator dict and a safe_op closure built per evaluation, the function run twice.
+
+def legacy_binary_op(self, node, **kwargs):
+    a, b = self.visit(node.left), self.visit(node.right)
+    op = node.op
+    location = node.location
+
+    def safe_op(func):
+        try:
+            if func(a, b) == 'undefined': raise ZeroDivisionError
+            return func(a, b)
+        except Exception:
+            raise TypeException(f"The expression '{a.__repr__()} {op} {b.__repr__()}' is not possible", location)
+
+    ops = {
+        "+": lambda x, y: x + y,
+        "-": lambda x, y: x - y,
+        "*": lambda x, y: x * y,
+        "/": lambda x, y: (x / y if y != 0 else float('inf')) if y != 0 and x != 0 else 'undefined',
+        ">": lambda x, y: x > y,
+        "<": lambda x, y: x < y,
+        "==": lambda x, y: x == y,
+        "!=": lambda x, y: x != y,
+        "<=": lambda x, y: x <= y,
+        ">=": lambda x, y: x >= y,
+    }
+
+    if op not in ops:
+        raise TypeException(f"Unknown operator '{op}'", location)
+
+    return safe_op(ops[op])
+
+class LegacyInterpreter(Interpreter):
+    visit_BinaryOp = legacy_binary_op
+
+CASES = {
+    'int + int': ('+', Number(3, 0), Number(4, 0)),
+    'int < int': ('<', Number(3, 0), Number(4, 0)),
+    'float * float': ('*', Float(1.5, 0), Float(2.5, 0)),
+    'int / int': ('/', Number(7, 0), Number(2, 0)),
+    'str + str': ('+', String('ab', 0), String('cd', 0)),
+}
+
+def bench(number=200000):
+    results = {}
+    for case, (op, left, right) in CASES.items():
+        node = BinaryOp(op, left, right, 0)
+        legacy, tree, closure = LegacyInterpreter(), Interpreter(), ClosureInterpreter()
+        compiled = closure.compile(node)
+        results[case] = {
+            'legacy': min(timeit.repeat(lambda: legacy.visit(node), number=number, repeat=5)),
+            'tree': min(timeit.repeat(lambda: tree.visit(node), number=number, repeat=5)),
+            'closure': min(timeit.repeat(compiled, number=number, repeat=5)),
+        }
+    return results
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    for case, timings in bench(number).items():
+        baseline = timings['legacy']
+        print(f"{case:<14} " + '  '.join(f"{name} {best * 1e9 / number:6.0f} ns x{baseline / best:4.2f}" for name, best in timings.items()))
@@ -0,0 +1,49 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import Client
+
+# Round-trip latency of one small program: a cold 'python interpreter.py' per run, 'python
+# Client.py' against a running --daemon (a Python process per run, but no interpreter imports)
+# and Client.request from an already running process (the socket round trip alone).
+
+SOURCE = """include 'standard'
+let items = new list()
+for (let i = 0 : i < 100 : i++) { items.append(i) }
+stdout(len(items))
+"""
+
+def median(times):
+    return sorted(times)[len(times) // 2] * 1000
+
+def timed(run, count):
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    directory = tempfile.mkdtemp()
+    socket_path, script = os.path.join(directory, 'daemon.sock'), os.path.join(directory, 'job.py++')
+    with open(script, 'w') as f: f.write(SOURCE)
+    daemon = subprocess.Popen([sys.executable, 'interpreter.py', '--daemon', socket_path, '--engine', 'closure', '--workers', '1'],
+                              cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        daemon.stdout.readline()  # "Serving on ..."
+        quiet = dict(cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        cold = timed(lambda: subprocess.run([sys.executable, 'interpreter.py', script, '--engine', 'closure'], **quiet), count)
+        client = timed(lambda: subprocess.run([sys.executable, 'Client.py', socket_path, script], **quiet), count)
+        resident = timed(lambda: Client.request(socket_path, file=script), count)
+    finally:
+        daemon.terminate(); daemon.wait()
+        shutil.rmtree(directory)
+    print(f"median of {count}  cold interpreter.py {cold:8.2f} ms  Client.py {client:8.2f} ms  Client.request {resident:8.2f} ms")
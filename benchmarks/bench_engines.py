@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+from Resolver import resolve
+from Runtime import interpret as interpret_tree
+from Closures import interpret as interpret_closures
+from VM import interpret as interpret_vm
+
+ENGINES = {'tree': interpret_tree, 'closure': interpret_closures, 'vm': interpret_vm}
+
+def bench(path, repeat=5, resolved=True):
+    code = open(path).read()
+    results = {}
+    for name, run in ENGINES.items():
+        timings = []
+        for _ in range(repeat):
+            ast = resolve(AST.to_ast(code)) if resolved else AST.to_ast(code)
+            start = time.perf_counter()
+            _, env = run(ast)
+            timings.append(time.perf_counter() - start)
+        results[name] = (min(timings), env.lookup('total', None))
+    return results
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), 'loops.py++')
+    baseline = None
+    for resolved in (False, True):
+        for name, (best, total) in bench(path, resolved=resolved).items():
+            baseline = baseline or best
+            name += ' +slots' if resolved else ''
+            print(f"{name:<14} {best * 1000:9.2f} ms  x{baseline / best:5.2f}  total={total}")
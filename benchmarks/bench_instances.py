@@ -0,0 +1,55 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+from Resolver import resolve
+from Closures import ClosureInterpreter
+
+# Allocates many small Py++ objects and keeps them alive, reporting construction time and the
+# memory retained per instance.
+
+PROGRAM = """
+include 'standard'
+
+class Point{
+    define $struct(x, y){
+        let this.x = x
+        let this.y = y
+        let this.z = x + y
+    }
+}
+
+define make(n){
+    let points = new list()
+    for (let i = 0 : i < n : i++) {
+        points.append(new Point(i, 1))
+    }
+    return points
+}
+"""
+
+def bench(count=50000):
+    interpreter = ClosureInterpreter()
+    interpreter.interpret(resolve(AST.to_ast(PROGRAM)))
+    make = interpreter.environment.lookup('make', None)
+    gc.collect()
+    start = time.perf_counter()
+    interpreter.execute_function(make, [count], None)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    points = interpreter.execute_function(make, [count], None)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, retained / len(points.list)
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    elapsed, per_instance = bench(count)
+    print(f"{count} instances  {elapsed * 1000:8.2f} ms  {elapsed * 1e6 / count:6.2f} us/instance  {per_instance:6.0f} bytes/instance")
@@ -0,0 +1,65 @@
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+from ASTNodes import ASTNode, unpack_location
+
+# Memory held by the AST of a synthetic program, against a reference copy of the same tree laid
+# out the way nodes were before __slots__ and packed locations: plain objects with a __dict__,
+# each holding the Token it was parsed from (shared between nodes of the same token).
+
+def synthetic_program(functions=2000):
+    return '\n'.join(
+        f"define f{i}(a, b){{\n"
+        f"    let c = a + b * {i}\n"
+        f"    if (c > 3) {{ c = c - 1 }} else {{ c = c + 2.5 }}\n"
+        f"    while (c < 10) {{ c = c + 1 }}\n"
+        f"    return c\n"
+        f"}}\n"
+        f"let r{i} = f{i}({i}, \"{i}\")"
+        for i in range(functions))
+
+class Token:
+    def __init__(self, type_, value, position, line, column):
+        self.type, self.value, self.position, self.line, self.column = type_, value, position, line, column
+
+reference_classes = {}
+
+def reference_copy(node, tokens):
+    if isinstance(node, list): return [reference_copy(item, tokens) for item in node]
+    if not isinstance(node, ASTNode): return node
+    cls = reference_classes.get(type(node))
+    if cls is None: cls = reference_classes[type(node)] = type(type(node).__name__, (), {})
+    copy = cls()
+    for base in type(node).__mro__:
+        for name in getattr(base, '__slots__', ()):
+            value = getattr(node, name, None)
+            if name == 'location' and value is not None:
+                token = tokens.get(value)
+                if token is None: token = tokens[value] = Token('TOKEN', None, *unpack_location(value))
+                value = token
+            setattr(copy, name, reference_copy(value, tokens))
+    return copy
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    code = synthetic_program(functions)
+    ast, retained, peak = traced(lambda: AST.to_ast(code))
+    # One statement at a time, so the slotted tree is released as its copy is built
+    reference, reference_retained, reference_peak = traced(lambda: [reference_copy(ast.pop(0), {}) for _ in range(len(ast))])
+    print(f"source {len(code) / 1024:8.0f} KiB  statements {len(reference)}")
+    print(f"__slots__ AST  retained {retained / 2**20:8.2f} MiB  peak {peak / 2**20:8.2f} MiB")
+    print(f"__dict__ AST   retained {reference_retained / 2**20:8.2f} MiB  peak {reference_peak / 2**20:8.2f} MiB  ({reference_retained / retained:.1f}x)")
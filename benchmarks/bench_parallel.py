@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+from Resolver import resolve
+from Closures import interpret
+
+# Scaling of standard.parallel_map: the same CPU-bound function over the same items with an
+# increasing number of worker processes. 1 worker runs in-process and is the baseline; the
+# others include starting the pool and shipping the function.
+
+PROGRAM = """
+include 'standard'
+define work(n) {{
+    let total = 0
+    for (let i = 0 : i < n : i++) {{ total = total + i * i }}
+    return total
+}}
+let items = new list()
+for (let j = 0 : j < {items} : j++) {{ items.append({size}) }}
+let results = parallel_map(work, items, {workers})
+"""
+
+def bench(workers, items=64, size=20000):
+    ast = resolve(AST.to_ast(PROGRAM.format(items=items, size=size, workers=workers)))
+    start = time.perf_counter()
+    _, env = interpret(ast)
+    return time.perf_counter() - start, env.lookup('results', None).list
+
+if __name__ == '__main__':
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    counts = sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    baseline, expected = bench(1, items)
+    for workers in counts:
+        elapsed, results = (baseline, expected) if workers == 1 else bench(workers, items)
+        assert results == expected
+        print(f"{workers:>3} workers  {elapsed * 1000:9.2f} ms  x{baseline / elapsed:5.2f}")
@@ -0,0 +1,59 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A program whose top-level lets, classes and defines build a lookup table and a linked list
+# before a short main part, run without --snapshot, with --snapshot while the snapshot is written,
+# and with --snapshot restoring it. Each run is a new interpreter process.
+
+PROGRAM = """
+include 'standard'
+class Node {{
+    define $struct(value, next){{
+        let this.value = value
+        let this.next = next
+    }}
+}}
+define build_table(n) {{
+    let table = new list()
+    for (let i = 0 : i < n : i++) {{ table.append(i * i) }}
+    return table
+}}
+define build_chain(n) {{
+    let head = null
+    for (let j = 0 : j < n : j++) {{ head = new Node(j, head) }}
+    return head
+}}
+let table = build_table({size})
+let chain = build_chain({size})
+stdout(table.get({size} - 1), chain.value)
+"""
+
+def timed(command, count):
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    directory = tempfile.mkdtemp()
+    try:
+        program, snapshot = os.path.join(directory, 'init.py++'), os.path.join(directory, 'init.snapshot')
+        with open(program, 'w') as f: f.write(PROGRAM.format(size=size))
+        command = [sys.executable, 'interpreter.py', program, '--engine', 'closure']
+        cold = timed(command, count)
+        saving = timed(command + ['--snapshot', snapshot], 1)
+        restored = timed(command + ['--snapshot', snapshot], count)
+        snapshot_size = os.path.getsize(snapshot)
+    finally:
+        shutil.rmtree(directory)
+    print(f"{size} items  no snapshot {cold:8.2f} ms  writing snapshot {saving:8.2f} ms  restored {restored:8.2f} ms  ({snapshot_size // 1024} KiB)")
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Writes lines to standard output with stdout() (print, flushed per call when unbuffered) and
+# with the block-buffered streams.output() writer, then reads the result back with lines() and
+# mapped(). Each program runs in its own interpreter process with output going to a file.
+
+WRITE = """
+include 'standard'
+include 'streams'
+{setup}
+for (let i = 0 : i < {count} : i++) {{ {call}("line", i) }}
+"""
+
+READ = """
+include 'streams'
+let reader = {open}("{path}")
+let total = 0
+let line = reader.next()
+while (line != null) {{
+    total = total + 1
+    line = reader.next()
+}}
+"""
+
+def run(program, stdout=subprocess.DEVNULL):
+    with tempfile.NamedTemporaryFile('w', suffix='.py++', delete=False) as f: f.write(program)
+    try:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'interpreter.py', f.name, '--engine', 'closure', '--no-cache'], cwd=ROOT, stdout=stdout, check=True)
+        return time.perf_counter() - start
+    finally:
+        os.remove(f.name)
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.NamedTemporaryFile('w+', suffix='.txt', delete=False) as out:
+        printed = run(WRITE.format(setup='', call='stdout', count=count), out)
+        out.truncate(0); out.seek(0)
+        buffered = run(WRITE.format(setup='let out = output()', call='out.write_line', count=count), out)
+    try:
+        lines = run(READ.format(open='lines', path=out.name))
+        mapped = run(READ.format(open='mapped', path=out.name))
+    finally:
+        os.remove(out.name)
+    print(f"write {count} lines  stdout {printed * 1000:8.2f} ms  output() {buffered * 1000:8.2f} ms")
+    print(f"read {count} lines   lines() {lines * 1000:8.2f} ms  mapped() {mapped * 1000:8.2f} ms")
@@ -0,0 +1,111 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import AST
+from Runtime import ModuleRegistry, interpret as interpret_tree
+from Closures import interpret as interpret_closures
+from VM import interpret as interpret_vm
+
+# Runs every benchmarks/*.py++ workload (or the ones named) and times lexing, parsing (including
+# resolution) and execution separately. Results can be saved as JSON and compared against a saved
+# baseline; a phase whose best time got slower by more than --threshold is reported as a regression
+# and makes the runner exit with status 1. A changed 'total' means the workload computed something
+# different and is reported as well.
+#
+#   python benchmarks/run.py --save baseline.json
+#   python benchmarks/run.py --baseline baseline.json
+
+ENGINES = {'tree': interpret_tree, 'closure': interpret_closures, 'vm': interpret_vm}
+PHASES = ('lex', 'parse', 'execute')
+
+def workloads(names=None):
+    paths = sorted(glob.glob(os.path.join(BENCH_DIR, '*.py++')))
+    if names: paths = [path for path in paths if os.path.basename(path)[:-5] in names]
+    return {os.path.basename(path)[:-5]: path for path in paths}
+
+def run_once(code, run):
+    start = time.perf_counter()
+    tokens = AST.Lexer(code).tokenize()
+    lexed = time.perf_counter()
+    modules = ModuleRegistry()
+    ast = modules.prepare(AST.Parser(tokens).parse())
+    parsed = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, env = run(ast, modules)
+    executed = time.perf_counter()
+    try: total = env.lookup('total', None)
+    except Exception: total = None
+    return (lexed - start, parsed - lexed, executed - parsed), total
+
+def bench(path, engine='tree', repeat=5, warmup=1):
+    with open(path) as f: code = f.read()
+    run, timings, total = ENGINES[engine], {phase: [] for phase in PHASES}, None
+    cwd = os.getcwd(); os.chdir(BENCH_DIR)  # workloads include 'lib/...' relative to this directory
+    try:
+        for i in range(warmup + repeat):
+            times, total = run_once(code, run)
+            if i < warmup: continue
+            for phase, elapsed in zip(PHASES, times): timings[phase].append(elapsed)
+    finally:
+        os.chdir(cwd)
+    return {'times': timings, 'total': repr(total)}
+
+def summary(result):
+    return {phase: min(result['times'][phase]) for phase in PHASES}
+
+def compare(results, baseline, threshold):
+    problems = []
+    for name, result in results.items():
+        old = baseline.get('results', {}).get(name)
+        if old is None: continue
+        if old['total'] != result['total']: problems.append(f"{name}: total changed from {old['total']} to {result['total']}")
+        new_best, old_best = summary(result), summary(old)
+        for phase in PHASES:
+            if old_best[phase] > 0 and new_best[phase] > old_best[phase] * (1 + threshold):
+                problems.append(f"{name}: {phase} {old_best[phase] * 1000:.2f} ms -> {new_best[phase] * 1000:.2f} ms "
+                                f"(+{(new_best[phase] / old_best[phase] - 1) * 100:.0f}%)")
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the Py++ benchmark workloads.')
+    parser.add_argument('workloads', nargs='*', help='workload names (default: all benchmarks/*.py++)')
+    parser.add_argument('--engine', choices=ENGINES, default='tree')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per workload (default: 5)')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs first (default: 1)')
+    parser.add_argument('--save', metavar='FILE', help='write the results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against results saved with --save')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown per phase (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'workload':<14} {'lex ms':>9} {'parse ms':>9} {'execute ms':>11} {'median ms':>10}  total")
+    for name, path in workloads(args.workloads).items():
+        result = results[name] = bench(path, args.engine, args.repeat, args.warmup)
+        best, median = summary(result), statistics.median(map(sum, zip(*result['times'].values())))
+        print(f"{name:<14} {best['lex'] * 1000:>9.2f} {best['parse'] * 1000:>9.2f} {best['execute'] * 1000:>11.2f} {median * 1000:>10.2f}  {result['total']}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'engine': args.engine, 'python': platform.python_version(), 'repeat': args.repeat, 'results': results}, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        if baseline.get('engine') != args.engine: print(f"note: baseline was run with --engine {baseline.get('engine')}")
+        problems = compare(results, baseline, args.threshold)
+        for problem in problems: print(f"REGRESSION {problem}")
+        if problems: return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,187 @@
+import time
+STARTED = time.perf_counter()
+import importlib
 import sys
-from tkinter import filedialog
-import AST
 from ASTNodes import *
-from Runtime import interpret
+from Runtime import ModuleRegistry, inline_cache_stats, memo_stats
 
-def interpret_file(file):
-    with open(file, 'r') as f:
+# Everything else is imported on first use: a run only loads the engine it executes with, and the
+# lexer and parser (AST.py) only when a file is not in the cache.
+ENGINES = {'tree': 'Runtime', 'closure': 'Closures', 'vm': 'VM'}
+
+def engine_interpret(engine): return importlib.import_module(ENGINES[engine]).interpret
+
+def source_line(file, line):
+    import linecache
+    return linecache.getline(file, line).rstrip('\n')
+
+def caret(e, line):
+    import AST
+    # Tokens know their text; packed node locations only know where they start.
+    if hasattr(e.token, 'value'): width = len(e.token.value)
+    else:
+        match = AST.Lexer.PATTERN.match(line, e.location[2] - 1)
+        width = len(match.group()) if match else 1
+    return f'{" " * (e.location[2]-1)}{width*"^"}'
+
+def parse_file(file, cache=True, timer=None):
+    if timer is not None: return timer.parse_file(file, cache)
+    if cache:
+        from Cache import load_ast
+        return load_ast(file)
+    import AST
+    with open(file, 'r') as f: return AST.to_ast(f)
+
+class StartupTimer:
+    # Wall time per phase for --startup-timing. 'imports' counts from the first line of this file,
+    # so the Python interpreter's own startup is not included. Included files are timed as a whole
+    # (their lexing, parsing and execution) under 'includes' and left out of 'execute'.
+    PHASES = ('imports', 'cache', 'lex', 'parse', 'resolve', 'includes', 'execute')
+
+    def __init__(self):
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.times['imports'] = time.perf_counter() - STARTED
+
+    def phase(self, name, func, *args):
+        start = time.perf_counter()
         try:
-            code = f.read()
-            ast = AST.to_ast(code)
-            interpreter = interpret(ast)
-            return interpreter
-        except SyntaxException as e:
-            if e.location is not None:
-                print('\033[31m'+code.split('\n')[e.location[1]-1])
-                print('\033[31m' + f'{" " * (e.location[2]-1)}{len(e.token.value)*"^"}')
-            print(e)
-            sys.exit(1)
-        except RuntimeException as e:
-            if e.location is not None:
-                print('\033[31m'+code.split('\n')[e.location[1]-1])
-                print('\033[31m' + f'{" " * (e.location[2]-1)}{len(e.token.value)*"^"}')
-            print(e)
-            sys.exit(1)
+            return func(*args)
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def parse_file(self, file, cache):
+        # Same as Cache.load_ast, but with the tokens materialized so lexing and parsing time apart
+        import Cache
+        if cache:
+            path, key = self.phase('cache', lambda: (Cache.cache_path(file), Cache.source_key(file)))
+            ast = self.phase('cache', Cache.read_cache, path, key)
+            if ast is not None: return ast
+        AST = self.phase('imports', importlib.import_module, 'AST')
+        with open(file, 'r') as f: code = f.read()
+        tokens = self.phase('lex', AST.Lexer(code).tokenize)
+        ast = self.phase('parse', AST.Parser(tokens).parse)
+        if cache: self.phase('cache', Cache.write_cache, path, key, ast)
+        return ast
+
+    def report(self):
+        total = sum(self.times.values())
+        lines = [f"{phase:<9} {elapsed * 1000:>9.2f} ms {elapsed / total * 100 if total else 0:>5.1f}%" for phase, elapsed in self.times.items()]
+        return '\n'.join(lines + [f"{'total':<9} {total * 1000:>9.2f} ms"])
+
+class TimedModuleRegistry(ModuleRegistry):
+    def __init__(self, timer, optimize=False, vectorize=False, cache=True):
+        super().__init__(optimize, vectorize, cache)
+        self.timer, self.depth = timer, 0
+
+    def load(self, kind, path, interpreter, node):
+        if self.depth: return super().load(kind, path, interpreter, node)  # nested includes are already being timed
+        self.depth += 1
+        try:
+            return self.timer.phase('includes', super().load, kind, path, interpreter, node)
+        finally:
+            self.depth -= 1
+
+def print_stats(modules):
+    stats = inline_cache_stats()
+    print(f"includes: {modules.stats()}", file=sys.stderr)
+    print(f"inline caches: {stats['sites']} sites, {stats['hits']} hits, {stats['misses']} misses, {stats['megamorphic']} megamorphic", file=sys.stderr)
+    memo = memo_stats()
+    if memo['functions']: print(f"memoized: {memo['functions']} functions, {memo['hits']} hits, {memo['misses']} misses, {memo['evictions']} evictions, {memo['uncached']} uncached", file=sys.stderr)
+
+def run_profiled(ast, engine, modules, stacks=None, program='<program>'):
+    import Profiler
+    result, profiler = Profiler.interpret(ast, engine, modules, program=program)
+    print(profiler.report(), file=sys.stderr)
+    if stacks:
+        with open(stacks, 'w') as f: f.write(profiler.collapsed() + '\n')
+    return result
+
+def interpret_file(file, engine='tree', cache=True, optimize=False, stats=False, profile=False, stacks=None, timer=None, vectorize=False, asynchronous=False, modules=None, snapshot=None):
+    # modules lets a caller (Batch.py, Daemon.py) pass a registry that shares parsed includes across files
+    try:
+        if timer is None:
+            modules = modules or ModuleRegistry(optimize, vectorize, cache)
+            ast = modules.prepare(parse_file(file, cache))
+            if profile or stacks: interpreter = run_profiled(ast, engine, modules, stacks, file)
+            elif asynchronous: interpreter = importlib.import_module('Async').interpret(ast, engine, modules)
+            elif snapshot: interpreter = importlib.import_module('Snapshot').interpret(file, ast, engine_interpret(engine), modules, snapshot)
+            else: interpreter = engine_interpret(engine)(ast, modules)
+        else:
+            modules = TimedModuleRegistry(timer, optimize, vectorize, cache)
+            ast = timer.phase('resolve', modules.prepare, parse_file(file, cache, timer))
+            if profile or stacks: run = lambda ast, modules: run_profiled(ast, engine, modules, stacks, file)
+            elif asynchronous:
+                Async = timer.phase('imports', importlib.import_module, 'Async')
+                run = lambda ast, modules: Async.interpret(ast, engine, modules)
+            else: run = timer.phase('imports', engine_interpret, engine)
+            includes = timer.times['includes']
+            interpreter = timer.phase('execute', run, ast, modules)
+            timer.times['execute'] -= timer.times['includes'] - includes
+            print(timer.report(), file=sys.stderr)
+        if stats: print_stats(modules)
+        return interpreter
+    except (SyntaxException, RuntimeException) as e:
+        show_error(e, source_line(e.file or file, e.location[1]) if e.location is not None else None)
+        sys.exit(1)
+
+def interpret_source(source, engine='tree', modules=None, optimize=False, vectorize=False, cache=True):
+    # interpret_file for program text (Daemon.py); includes resolve against the working directory
+    import AST
+    try:
+        modules = modules or ModuleRegistry(optimize, vectorize, cache)
+        return engine_interpret(engine)(modules.prepare(AST.to_ast(source)), modules)
+    except (SyntaxException, RuntimeException) as e:
+        if e.file is not None: line = source_line(e.file, e.location[1]) if e.location is not None else None
+        else:
+            lines = source.split('\n')
+            line = lines[e.location[1] - 1] if e.location is not None and e.location[1] <= len(lines) else None
+        show_error(e, line)
+        sys.exit(1)
+
+def show_error(e, line):
+    if line is not None:
+        print('\033[31m'+line)
+        print('\033[31m' + caret(e, line))
+    print(e)
 
 if __name__ == '__main__':
-    interpret_file('program.py++')
+    import argparse
+    parser = argparse.ArgumentParser(description='Run a Py++ program.')
+    parser.add_argument('file', nargs='*', default=['program.py++'], help='program to run (with --batch: any number of scripts and directories)')
+    parser.add_argument('--engine', choices=ENGINES, default='tree', help='execution engine (default: tree)')
+    parser.add_argument('-O', '--optimize', action='store_true', help='fold constants, drop dead branches and collapse increments before running')
+    parser.add_argument('--vectorize', action='store_true', help='apply arithmetic and comparisons on arrays elementwise (NumPy if installed)')
+    parser.add_argument('--async', dest='asynchronous', action='store_true', help="run on an asyncio event loop so the awaitable builtins of 'tasks' overlap")
+    parser.add_argument('--no-cache', action='store_true', help='always re-parse instead of using __pypp_cache__')
+    parser.add_argument('--disassemble', action='store_true', help='print the bytecode of the program and exit')
+    parser.add_argument('--stats', action='store_true', help='print include, inline cache and memoization counters to stderr after running')
+    parser.add_argument('--profile', action='store_true', help='print time per function and per line to stderr after running')
+    parser.add_argument('--profile-stacks', metavar='FILE', help='profile and write collapsed stacks (flamegraph.pl, speedscope) to FILE')
+    parser.add_argument('--startup-timing', action='store_true', help='print the time spent importing, lexing, parsing, resolving, including and executing to stderr')
+    parser.add_argument('--batch', action='store_true', help='run every given script (and the .py++ files in given directories) on a pool of warm worker processes')
+    parser.add_argument('--workers', type=int, help='worker processes for --batch and --daemon (default: one per CPU)')
+    parser.add_argument('--batch-report', metavar='FILE', help='write the output, status and time of every --batch job as JSON')
+    parser.add_argument('--daemon', metavar='SOCKET', help='serve requests from Client.py on a Unix socket with warm worker processes')
+    parser.add_argument('--timeout', type=float, default=30.0, help='longest a --daemon request may run in seconds (default: 30)')
+    parser.add_argument('--snapshot', metavar='FILE', help='restore the globals set up by the leading declarations and includes from FILE, or save them there')
+    args = parser.parse_args()
+    if args.batch:
+        from Batch import run_batch
+        sys.exit(run_batch(args.file, engine=args.engine, workers=args.workers, cache=not args.no_cache, optimize=args.optimize, vectorize=args.vectorize, report=args.batch_report))
+    if args.daemon:
+        from Daemon import serve
+        sys.exit(serve(args.daemon, engine=args.engine, workers=args.workers, timeout=args.timeout, cache=not args.no_cache, optimize=args.optimize, vectorize=args.vectorize))
+    if len(args.file) > 1: parser.error('more than one file needs --batch')
+    if args.snapshot and (args.asynchronous or args.profile or args.profile_stacks or args.startup_timing):
+        parser.error('--snapshot cannot be combined with --async, --profile, --profile-stacks or --startup-timing')
+    if args.asynchronous and (args.profile or args.profile_stacks):
+        parser.error('--async cannot be combined with --profile or --profile-stacks')
+    args.file = args.file[0]
+    if args.disassemble:
+        from Bytecode import compile_program, disassemble
+        code, compiler = compile_program(ModuleRegistry(args.optimize, args.vectorize, not args.no_cache).prepare(parse_file(args.file, cache=not args.no_cache)))
+        print(disassemble(code, compiler.functions))
+    else:
+        interpret_file(args.file, engine=args.engine, cache=not args.no_cache, optimize=args.optimize, stats=args.stats, profile=args.profile, stacks=args.profile_stacks,
+                       timer=StartupTimer() if args.startup_timing else None, vectorize=args.vectorize,
+                       asynchronous=args.asynchronous, snapshot=args.snapshot)
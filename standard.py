@@ -1,3 +1,7 @@
+import operator
+from array import array
+from itertools import repeat
+
 class List:
     def __init__(self, *args):
         self.list = list(args)
@@ -41,4 +45,126 @@ class List:
     def __len__(self):
         return len(self.list)
 
-__include__ = {"stdout": print, "stdin": lambda prompt='': input(prompt), "str": str, "int": int, "float": float, "len": len, 'list': List}
\ No newline at end of file
+def typecode(values):
+    # 'q' (64-bit int) while every value is an int, 'd' (double) as soon as one is not
+    return 'q' if values and all(isinstance(value, int) for value in values) else 'd'
+
+def kind(data): return data.typecode if isinstance(data, array) else data.format
+
+def build(code, values):
+    # values() gives the elements; ints too large for 'q' are stored as 'd' instead, as if a float were involved
+    try:
+        return array(code, values())
+    except OverflowError:
+        if code != 'q': raise ValueError("Array values must fit in a double (use a list for larger numbers)") from None
+    return build('d', values)
+
+def store(data, index, value):
+    try:
+        if index is None: data.append(value)
+        else: data[index] = value
+    except OverflowError:
+        raise ValueError(f"{value} does not fit in an array of {'64-bit ints' if kind(data) == 'q' else 'doubles'}") from None
+
+def wrap(data):
+    result = Array.__new__(Array)
+    result.data = data
+    return result
+
+def elementwise(op, a, b, code=None):
+    if isinstance(b, Array):
+        if len(a.data) != len(b.data): raise ValueError(f"Arrays of length {len(a.data)} and {len(b.data)} cannot be combined")
+        return wrap(build(code or ('q' if kind(a.data) == kind(b.data) == 'q' else 'd'), lambda: map(op, a.data, b.data)))
+    if isinstance(b, (int, float)):
+        return wrap(build(code or ('q' if kind(a.data) == 'q' and isinstance(b, int) else 'd'), lambda: map(op, a.data, repeat(b))))
+    return NotImplemented
+
+def reflected(op): return lambda a, b: op(b, a)
+
+class Array:
+    # Numeric array for large data sets. Values are stored unboxed in an array.array ('q' for ints,
+    # 'd' once a float is involved) instead of a list of Python objects; + - * / work elementwise
+    # with another array of the same length or a number, and slice() returns a view that shares
+    # the array's memory. An array cannot grow while slices of it are alive. Unlike Py++ ints, int
+    # elements are 64-bit: an array built from, or computed into, ints outside -2**63 .. 2**63 - 1
+    # holds doubles instead (exact up to 2**53), and append() / set() of such an int on an int
+    # array raise a ValueError.
+    __slots__ = ('data',)
+
+    def __init__(self, *values):
+        if len(values) == 1 and not isinstance(values[0], (int, float)): values = values[0]
+        if isinstance(values, Array): values = values.data
+        elif isinstance(values, List): values = values.list
+        values = values if isinstance(values, (array, memoryview)) else tuple(values)
+        self.data = build(kind(values) if isinstance(values, (array, memoryview)) else typecode(values), lambda: values)
+
+    def append(self, value):
+        if not isinstance(self.data, array): raise TypeError("Cannot append to a slice of an array")
+        try:
+            store(self.data, None, value)
+        except BufferError:
+            raise ValueError("Cannot append to an array while slices of it exist") from None
+
+    def get(self, index):
+        return self.data[int(index)]
+
+    def set(self, index, value):
+        store(self.data, int(index), value)
+
+    def slice(self, start, stop=None):
+        return wrap(memoryview(self.data)[int(start):None if stop is None else int(stop)])
+
+    def copy(self):
+        return wrap(array(kind(self.data), self.data))
+
+    def list(self):
+        return List(*self.data)
+
+    def sum(self):
+        return sum(self.data)
+
+    def min(self):
+        return min(self.data)
+
+    def max(self):
+        return max(self.data)
+
+    def mean(self):
+        if not len(self.data): raise ValueError("mean() of an empty array")
+        return sum(self.data) / len(self.data)
+
+    def index(self, value):
+        return self.data.tolist().index(value)
+
+    def difference(self, other):
+        # Values not in other, in order; a set makes this O(n + m) where List - List is O(n * m)
+        exclude = set(other.data if isinstance(other, Array) else other.list if isinstance(other, List) else other)
+        return wrap(array(kind(self.data), [value for value in self.data if value not in exclude]))
+
+    def __add__(self, other): return elementwise(operator.add, self, other)
+    def __sub__(self, other): return elementwise(operator.sub, self, other)
+    def __mul__(self, other): return elementwise(operator.mul, self, other)
+    def __truediv__(self, other): return elementwise(operator.truediv, self, other, 'd')
+    def __radd__(self, other): return elementwise(reflected(operator.add), self, other)
+    def __rsub__(self, other): return elementwise(reflected(operator.sub), self, other)
+    def __rmul__(self, other): return elementwise(reflected(operator.mul), self, other)
+    def __rtruediv__(self, other): return elementwise(reflected(operator.truediv), self, other, 'd')
+
+    def __getitem__(self, index):
+        return self.data[int(index)]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"Array({', '.join(repr(i) for i in self.data)})"
+
+def parallel_map(function, items, workers=None):
+    # Loaded on first use: process pools are expensive to import and most programs never need one
+    import Parallel
+    return Parallel.parallel_map(function, items, workers)
+
+__include__ = {"stdout": print, "stdin": input, "str": str, "int": int, "float": float, "len": len, 'list': List, 'array': Array, 'parallel_map': parallel_map}
\ No newline at end of file
@@ -0,0 +1,135 @@
+import mmap
+import os
+import sys
+
+# Streaming file I/O for Py++ (include 'streams'). Nothing here reads a whole file up front:
+#   writer(path) / writer(path, true)  a block-buffered file writer (true appends)
+#   output()                           a block-buffered writer on standard output
+#   lines(path)                        reads a file one line at a time: next() gives null at the end
+#   mapped(path)                       memory-maps a file for reads, finds and line-by-line scans
+# Values are written the way stdout prints them, separated by spaces. Each kind of object is a
+# plain class with __slots__, so method calls and property reads on it go through the inline caches.
+
+BUFFER_SIZE = 1 << 16
+
+class Writer:
+    __slots__ = ('file', 'lines')
+
+    def __init__(self, file):
+        self.file, self.lines = file, 0
+
+    def write(self, *values):
+        return self.file.write(' '.join(map(str, values)))
+
+    def write_line(self, *values):
+        self.lines += 1
+        return self.file.write(' '.join(map(str, values)) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __repr__(self): return f"<writer {self.file.name}>"
+
+def writer(path, append=False):
+    return Writer(open(path, 'a' if append else 'w', buffering=BUFFER_SIZE))
+
+class Output(Writer):
+    # Writes to the sys.stdout of the moment output() was called. A real stream is written through
+    # its binary buffer, which is block-buffered even on a terminal and flushed by Python at exit;
+    # anything else (the capture of a --batch or --daemon job) is written to directly. Output from
+    # stdout() goes around that buffer, so flush() before mixing the two.
+    __slots__ = ('encoding',)
+
+    def __init__(self, stream):
+        buffer = getattr(stream, 'buffer', None)
+        stream.flush()
+        super().__init__(stream if buffer is None else buffer)
+        self.encoding = None if buffer is None else stream.encoding
+
+    def write(self, *values):
+        text = ' '.join(map(str, values))
+        self.file.write(text if self.encoding is None else text.encode(self.encoding, 'replace'))
+        return len(text)
+
+    def write_line(self, *values):
+        self.lines += 1
+        return self.write(' '.join(map(str, values)) + '\n')
+
+    def close(self):
+        self.file.flush()  # standard output stays open
+
+    def __repr__(self): return "<writer stdout>"
+
+def output():
+    return Output(sys.stdout)
+
+class Lines:
+    __slots__ = ('file', 'number')
+
+    def __init__(self, path):
+        self.file, self.number = open(path, buffering=BUFFER_SIZE), 0
+
+    def next(self):
+        if self.file.closed: return None  # at the end, or closed: every later call is null too
+        line = self.file.readline()
+        if not line:
+            self.file.close()
+            return None
+        self.number += 1
+        return line[:-1] if line[-1] == '\n' else line
+
+    def close(self):
+        self.file.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.next()
+        if line is None: raise StopIteration
+        return line
+
+    def __repr__(self): return f"<lines {self.file.name}>"
+
+class MappedFile:
+    # Pages are read in by the OS as they are touched, so multi-GB inputs cost no memory up front.
+    # Offsets are in bytes; text is decoded as UTF-8.
+    __slots__ = ('file', 'map', 'number')
+
+    def __init__(self, path):
+        self.file, self.number = open(path, 'rb'), 0
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(self.file.fileno()).st_size else None
+
+    def size(self):
+        return len(self.map) if self.map is not None else 0
+
+    def read(self, start, stop):
+        return self.map[int(start):int(stop)].decode(errors='replace') if self.map is not None else ''
+
+    def find(self, text, start=0):
+        return self.map.find(text.encode(), int(start)) if self.map is not None else -1
+
+    def count(self, text):
+        needle, count, position = text.encode(), 0, self.find(text)
+        if not needle: return 0
+        while position != -1:
+            count += 1
+            position = self.map.find(needle, position + len(needle))
+        return count
+
+    def next(self):
+        line = self.map.readline() if self.map is not None else b''
+        if not line: return None
+        self.number += 1
+        return (line[:-1] if line[-1:] == b'\n' else line).decode(errors='replace')
+
+    def close(self):
+        if self.map is not None: self.map.close()
+        self.file.close()
+
+    def __repr__(self): return f"<mapped {self.file.name}>"
+
+__include__ = {'writer': writer, 'output': output, 'lines': Lines, 'mapped': MappedFile}
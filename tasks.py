@@ -0,0 +1,80 @@
+import asyncio
+import subprocess
+import time
+from concurrent.futures import Future
+import Async
+from ASTNodes import TypeException
+from Runtime import CallerFunction, UserDefinedFunction, ClassObject
+from standard import List
+
+# Awaitable builtins for Py++ (include 'tasks'). Run with --async and every call below lets the
+# other tasks run while it waits; without it they simply block, so a script works either way.
+
+class Task:
+    # Handle returned by spawn(); result() waits for the task and returns (or raises) its outcome
+    def __init__(self, future): self.future = future
+
+    def result(self): return gather(self).get(0)
+
+    def done(self): return self.future.done()
+
+    def __repr__(self): return f"<task {'done' if self.future.done() else 'running'}>"
+
+def wait(coroutine):
+    return Async.current.wait(coroutine) if Async.current else asyncio.run(coroutine)
+
+def in_thread(func, *args):
+    async def call(): return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    return call()
+
+def sleep(seconds):
+    if not Async.current: return time.sleep(seconds)
+    wait(asyncio.sleep(seconds))
+
+def read_file(path):
+    def read():
+        with open(path) as f: return f.read()
+    return wait(in_thread(read)) if Async.current else read()
+
+def write_file(path, text):
+    def write():
+        with open(path, 'w') as f: return f.write(str(text))
+    return wait(in_thread(write)) if Async.current else write()
+
+def read_line(prompt=''):
+    return wait(in_thread(input, prompt)) if Async.current else input(prompt)
+
+async def shell(command):
+    process = await asyncio.create_subprocess_shell(command, stdout=subprocess.PIPE)
+    output, _ = await process.communicate()
+    return process.returncode, output.decode()
+
+def run(command):
+    # Runs a shell command and returns what it printed; a non-zero exit status is an error
+    code, output = wait(shell(command))
+    if code: raise RuntimeError(f"'{command}' exited with status {code}")
+    return output
+
+def spawn(interpreter, node, function, *args):
+    # A CallerFunction: without --async the function runs right away on the calling interpreter
+    if not (callable(function) or isinstance(function, (UserDefinedFunction, ClassObject))):
+        raise TypeException(f"spawn() needs a function, not {function!r}", node.location if node else None)
+    if Async.current: return Task(Async.current.spawn(function, args, node))
+    if interpreter is None:
+        from Closures import ClosureInterpreter
+        interpreter = ClosureInterpreter()
+    future = Future()
+    try: future.set_result(interpreter.call(node, function, list(args)))
+    except Exception as e: future.set_exception(e)
+    return Task(future)
+
+def gather(*tasks):
+    # gather(a, b) or gather(listOfTasks): the results in the same order, once all are done
+    if len(tasks) == 1 and isinstance(tasks[0], (List, tuple)): tasks = tasks[0].list if isinstance(tasks[0], List) else tasks[0]
+    futures = [task.future for task in tasks]
+    if Async.current and not all(future.done() for future in futures):
+        async def gathered(): return await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        wait(gathered())
+    return List(*[future.result() for future in futures])
+
+__include__ = {'sleep': sleep, 'read_file': read_file, 'write_file': write_file, 'read_line': read_line, 'run': run, 'spawn': CallerFunction(spawn), 'gather': gather}
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+import Async
+from ASTNodes import *
+from Runtime import ModuleRegistry
+from interpreter import ENGINES, engine_interpret
+
+# Tail calls, and calls that go through something other than a plain call site (spawn,
+# memoized functions), behave the same on every engine, with and without --async, and errors keep
+# the location of the code raising them.
+
+def run(source, engine, asynchronous=False):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            modules = ModuleRegistry(cache=False)
+            ast = modules.prepare(AST.to_ast(source))
+            if asynchronous: Async.interpret(ast, engine, modules)
+            else: engine_interpret(engine)(ast, modules)
+            error = None
+        except PyPlusPlusException as e:
+            error = type(e).__name__, str(e), e.location
+    return output.getvalue(), error
+
+class CallTest(unittest.TestCase):
+    def assertSame(self, source, expected, modes=(False,)):
+        for engine in ENGINES:
+            for asynchronous in modes:
+                with self.subTest(engine=engine, asynchronous=asynchronous):
+                    self.assertEqual(run(source, engine, asynchronous), expected)
+
+    def test_tail_calls(self):
+        # Far deeper than Python's recursion limit: 'return f(...)' reuses the caller's frame
+        self.assertSame("""
+include 'standard'
+define count(n, acc) {
+    if (n == 0) { return acc }
+    return count(n - 1, acc + 1)
+}
+define even(n) {
+    if (n == 0) { return true }
+    return odd(n - 1)
+}
+define odd(n) {
+    if (n == 0) { return false }
+    return even(n - 1)
+}
+define twice(n) {
+    return n * 2
+}
+define outer(n) {
+    let doubled = twice(n)
+    return twice(doubled)
+}
+stdout(count(100000, 0), even(50001), odd(50001), outer(3))
+""", ("100000 False True 12\n", None))
+
+    def test_spawn(self):
+        self.assertSame("""
+include 'standard'
+include 'tasks'
+define work(n) {
+    return n * 2
+}
+let a = spawn(work, 1)
+let b = spawn(work, 2)
+stdout(gather(a, b), a.result())
+""", ("List(2, 4) 2\n", None), (False, True))
+
+    def test_spawn_errors(self):
+        failing = run("include 'tasks'\ndefine bad(x) {\n    return x / 0\n}\nlet t = spawn(bad, 1)\nt.result()\n", 'tree')[1]
+        self.assertEqual((failing[0], failing[2][1:]), ('TypeException', (3, 16)))
+        self.assertSame("include 'tasks'\ndefine bad(x) {\n    return x / 0\n}\nlet t = spawn(bad, 1)\nt.result()\n", ('', failing), (False, True))
+        not_callable = run("include 'tasks'\nlet t = spawn(5, 1)\n", 'tree')[1]
+        self.assertEqual((not_callable[0], not_callable[2][1]), ('TypeException', 2))
+        self.assertSame("include 'tasks'\nlet t = spawn(5, 1)\n", ('', not_callable), (False, True))
+
+    def test_memoize(self):
+        self.assertSame("""
+include 'standard'
+$memoize = 64
+define fib(n) {
+    if (n < 2) { return n }
+    let a = fib(n - 1)
+    let b = fib(n - 2)
+    return a + b
+}
+stdout(fib(60), fib.stats())
+""", ("1548008755920 {'size': 61, 'maxsize': 64, 'hits': 58, 'misses': 61, 'evictions': 0, 'uncached': 0}\n", None))
+
+    def test_memoize_errors(self):
+        source = "$memoize = 4\ndefine twice(a, a) {\n    return a\n}\nlet t = twice(1, 2)\n"
+        error = run(source, 'tree')[1]
+        self.assertEqual((error[0], error[2][1]), ('NameException', 5))
+        self.assertSame(source, ('', error))
+
+if __name__ == '__main__':
+    unittest.main()
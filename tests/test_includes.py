@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import interpreter
+from interpreter import ENGINES
+
+# Included .py++ files on every engine: each file runs once however often it is included,
+# circular includes are errors, and errors raised while an include runs are reported with the
+# included file's own line.
+
+class IncludeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+        self.addCleanup(os.chdir, self.cwd)
+
+    def write(self, path, source):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f: f.write(source)
+
+    def run_file(self, file, engine, cache=False):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                interpreter.interpret_file(file, engine=engine, cache=cache)
+                status = 0
+            except SystemExit as e:
+                status = e.code
+        return status, output.getvalue()
+
+    def test_included_once(self):
+        self.write('counter.py++', "include 'standard'\nstdout('loading counter')\nlet count = 0\ndefine bump() {\n    count = count + 1\n    return count\n}\n")
+        self.write('a.py++', "include 'counter.py++'\nlet from_a = bump()\n")
+        self.write('main.py++', "include 'standard'\ninclude 'counter.py++'\ninclude 'a.py++'\ninclude 'counter'\nstdout(from_a, bump())\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(self.run_file('main.py++', engine), (0, 'loading counter\n1 2\n'))
+
+    def test_circular_include(self):
+        self.write('loop1.py++', "include 'loop2.py++'\n")
+        self.write('loop2.py++', "include 'loop1.py++'\n")
+        self.write('main.py++', "include 'standard'\ninclude 'loop1.py++'\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                status, output = self.run_file('main.py++', engine)
+                self.assertEqual(status, 1)
+                self.assertEqual(output.split('\n')[0], "\033[31minclude 'loop1.py++'")
+                self.assertIn('Circular include: ', output)
+                self.assertIn('loop1.py++ -> ', output)
+
+    def test_cache(self):
+        self.write('lib/lib.py++', "let value = 2\n")
+        self.write('main.py++', "include 'standard'\ninclude 'lib/lib.py++'\nstdout(value)\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(self.run_file('main.py++', engine), (0, '2\n'))
+                self.assertFalse(os.path.exists(os.path.join('lib', '__pypp_cache__')))
+                self.assertEqual(self.run_file('main.py++', engine, cache=True), (0, '2\n'))
+                self.assertTrue(os.listdir(os.path.join('lib', '__pypp_cache__')))
+                self.assertEqual(self.run_file('main.py++', engine, cache=True), (0, '2\n'))
+                shutil.rmtree(os.path.join('lib', '__pypp_cache__'))
+
+    def test_error_in_included_file(self):
+        self.write('inc/bad.py++', "include 'standard'\nlet a = 1\nlet b = a + missing_name\n")
+        self.write('main.py++', "include 'standard'\ninclude 'inc/bad.py++'\nstdout('x')\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                status, output = self.run_file('main.py++', engine)
+                self.assertEqual(status, 1)
+                lines = output.split('\n')
+                self.assertEqual(lines[0], '\033[31mlet b = a + missing_name')
+                self.assertEqual(lines[1], '\033[31m' + ' ' * 12 + '^' * 12)
+                self.assertIn('line 3, col 13', lines[2])
+
+    def test_error_in_nested_include(self):
+        self.write('inner.py++', "include 'standard'\n\nlet z = 1 / 0\n")
+        self.write('outer.py++', "include 'inner.py++'\n")
+        self.write('main.py++', "include 'standard'\ninclude 'outer.py++'\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                status, output = self.run_file('main.py++', engine)
+                self.assertEqual(status, 1)
+                self.assertEqual(output.split('\n')[0], '\033[31mlet z = 1 / 0')
+
+    def test_error_in_main_file_after_include(self):
+        self.write('lib.py++', "let value = 2\n")
+        self.write('main.py++', "include 'standard'\ninclude 'lib.py++'\nstdout(value + nothing)\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                status, output = self.run_file('main.py++', engine)
+                self.assertEqual(status, 1)
+                self.assertEqual(output.split('\n')[0], '\033[31mstdout(value + nothing)')
+
+if __name__ == '__main__':
+    unittest.main()
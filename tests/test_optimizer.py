@@ -0,0 +1,175 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+from ASTNodes import *
+from Optimizer import Optimizer
+from Runtime import ModuleRegistry
+from interpreter import ENGINES, engine_interpret
+
+# -O must not change what a program does: every program below runs on every engine with and
+# without the optimizer, and the output and the error (type, message and location) must be the
+# same as on the unoptimized tree walker.
+
+PROGRAMS = {
+    'folding': """
+include 'standard'
+let a = 2 * 3 + 4
+let b = 7 / 2 - 0.5
+let s = "ab" + "cd"
+let t = 3 > 2
+let u = 1 == 1.0
+let v = null == null
+stdout(a, b, s, t, u, v, 10 - 2 * 3, "x" + "y" + "z")
+""",
+    'dead branches': """
+include 'standard'
+if (true) { stdout("then") } else { stdout("else") }
+if (1 > 2) { stdout("never") } else { stdout("otherwise") }
+if (false) { stdout("gone") }
+while (false) { stdout("no loop") }
+while (1 == 2) { stdout("no loop either") }
+for (let i = 0 : false : i++) { stdout("no for") }
+stdout(i)
+define pick(n) {
+    if (2 > 1) { return n + 1 }
+    return n
+}
+stdout(pick(1))
+""",
+    'increments': """
+include 'standard'
+let x = 1
+x = x + 1
+x = x - 3
+x = x + 2.5
+let s = "a"
+s = s + "b"
+stdout(x, s)
+for (let i = 0 : i < 3 : i = i + 1) { x = x + i }
+stdout(x)
+""",
+    'constant increment': """
+include 'standard'
+const c = 1
+stdout(c)
+c = c + 1
+""",
+    'increment of a string': """
+include 'standard'
+let s = "text"
+s = s - 1
+""",
+    'division by zero': """
+include 'standard'
+stdout("before")
+let d = 2 * 3 / 0
+""",
+    'zero divided': """
+include 'standard'
+let z = 0 / 5
+""",
+    'impossible operation': """
+include 'standard'
+let w = 1 + 2 - "x"
+""",
+    'error after folding': """
+include 'standard'
+define f(n) {
+    let k = 4 * 5
+    return k + n + missing
+}
+stdout(f(1))
+""",
+    'pruned branch error': """
+include 'standard'
+if (false) { stdout(1 / 0) } else { stdout(undefined_name) }
+""",
+}
+
+VECTOR_PROGRAM = """
+include 'standard'
+let x = [1, 2, 3]
+x += 1
+x = x - 2
+x++
+let n = 1
+n = n + 1
+stdout(x, n)
+"""
+
+def run(source, engine, optimize, vectorize=False):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            modules = ModuleRegistry(optimize, vectorize, cache=False)
+            engine_interpret(engine)(modules.prepare(AST.to_ast(source)), modules)
+            error = None
+        except PyPlusPlusException as e:
+            error = type(e).__name__, str(e), e.location
+    return output.getvalue(), error
+
+class OptimizerSemanticsTest(unittest.TestCase):
+    def test_same_behaviour_on_every_engine(self):
+        for name, source in PROGRAMS.items():
+            expected = run(source, 'tree', False)
+            for engine in ENGINES:
+                for optimize in (False, True):
+                    with self.subTest(program=name, engine=engine, optimize=optimize):
+                        self.assertEqual(run(source, engine, optimize), expected)
+
+    def test_expected_errors(self):
+        # The programs meant to fail do fail, so the comparison above covers their errors
+        for name in ('constant increment', 'increment of a string', 'division by zero', 'zero divided',
+                     'impossible operation', 'error after folding', 'pruned branch error'):
+            with self.subTest(program=name):
+                self.assertIsNotNone(run(PROGRAMS[name], 'tree', True)[1])
+
+    def test_vectorized_increments(self):
+        # -O must not turn x += 1 on an array into a scalar increment
+        expected = run(VECTOR_PROGRAM, 'tree', False, True)
+        self.assertIsNone(expected[1])
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(VECTOR_PROGRAM, engine, True, True), expected)
+
+class OptimizerRewriteTest(unittest.TestCase):
+    def optimized(self, source):
+        optimizer = Optimizer()
+        return optimizer.optimize_program(AST.to_ast(source)), optimizer
+
+    def test_folds_literals(self):
+        ast, optimizer = self.optimized('let a = 2 * 7\nlet s = "ab" + "cd"\nlet t = 2 > 1')
+        self.assertIsInstance(ast[0].value, Number)
+        self.assertEqual(ast[0].value.value, 14)
+        self.assertEqual(ast[1].value.value, "abcd")
+        self.assertIsInstance(ast[2].value, BooleanLiteral)
+        self.assertEqual(optimizer.folded, 3)
+
+    def test_keeps_failing_operations(self):
+        ast, optimizer = self.optimized('let d = 1 / 0\nlet z = 0 / 5\nlet w = 1 - "x"')
+        for statement in ast: self.assertIsInstance(statement.value, BinaryOp)
+        self.assertEqual(optimizer.folded, 0)
+
+    def test_prunes_dead_branches(self):
+        ast, optimizer = self.optimized('if (false) { let a = 1 }\nwhile (false) { let b = 2 }\nif (true) { let c = 3 }')
+        self.assertEqual(len(ast), 1)
+        self.assertIsInstance(ast[0], Block)
+        self.assertEqual(optimizer.pruned, 3)
+
+    def test_collapses_increments(self):
+        ast, optimizer = self.optimized('let x = 1\nx = x + 1\nx = x - 2.5\nx = 1 + x')
+        self.assertIsInstance(ast[1], Increment)
+        self.assertEqual((ast[1].op, ast[1].amount), ('+', 1))
+        self.assertIsInstance(ast[2], Increment)
+        self.assertEqual((ast[2].op, ast[2].amount), ('-', 2.5))
+        self.assertIsInstance(ast[3], Assignment)
+        self.assertEqual(optimizer.increments, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+import Profiler
+from Runtime import ModuleRegistry
+from interpreter import ENGINES
+
+# --profile on every engine: calls per function and hits per line, with statements charged to
+# the line they start on.
+
+PROGRAM = """define fib(n){
+    if (n < 2) {
+        return n
+    }
+    let a = fib(n - 1)
+    let b = fib(n - 2)
+    return a + b
+}
+class Counter{
+    define $struct(){
+        let this.count = 0
+    }
+}
+let total = 0
+for (let i = 0 : i < 3 : i++) {
+    total = total + i
+}
+while (total > 0) {
+    total = total - 1
+}
+let c = new Counter()
+let f = fib(10)
+"""
+
+def profile(engine):
+    modules = ModuleRegistry(cache=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, profiler = Profiler.interpret(modules.prepare(AST.to_ast(PROGRAM)), engine, modules, program='p.py++')
+    return profiler
+
+class ProfilerTest(unittest.TestCase):
+    def test_counts_and_lines(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                profiler = profile(engine)
+                self.assertEqual(profiler.functions['fib'][0], 177)
+                self.assertEqual(profiler.functions['Counter.$struct'][0], 1)
+                hits = {(name, line): counters[0] for (name, _, line), counters in profiler.lines.items()}
+                self.assertEqual(hits[('fib', 2)], 177)   # the if, not its closing brace
+                self.assertEqual(hits[('fib', 3)], 89)
+                self.assertEqual(hits[('fib', 5)], 88)
+                self.assertEqual(hits[('<program>', 1)], 1)   # define
+                self.assertEqual(hits[('<program>', 9)], 1)   # class
+                self.assertEqual(hits[('<program>', 15)], 5)  # for, its init and 3 updates
+                self.assertEqual(hits[('<program>', 18)], 1)  # while
+                self.assertEqual(hits[('<program>', 19)], 3)
+                for brace in (4, 8, 13, 17, 20):
+                    self.assertNotIn(('<program>', brace), hits)
+                    self.assertNotIn(('fib', brace), hits)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AST
+from ASTNodes import *
+from Runtime import ModuleRegistry
+from interpreter import ENGINES, engine_interpret
+
+# Variables resolved to slots and loop bodies that reuse their environment: every engine must
+# print the expected output, or raise the same error as the tree walker.
+
+def run(source, engine):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            modules = ModuleRegistry(cache=False)
+            engine_interpret(engine)(modules.prepare(AST.to_ast(source)), modules)
+            error = None
+        except PyPlusPlusException as e:
+            error = type(e).__name__, str(e), e.location
+    return output.getvalue(), error
+
+class ScopeTest(unittest.TestCase):
+    def assertOutput(self, source, expected):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(source, engine), (expected, None))
+
+    def assertError(self, source, error, line):
+        expected = run(source, 'tree')
+        self.assertEqual((expected[1][0], expected[1][2][1]), (error, line))
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(source, engine), expected)
+
+    def test_resolved_slots(self):
+        self.assertOutput("""
+include 'standard'
+let x = 1
+define outer(a) {
+    let y = a + x
+    define inner(b) {
+        let z = b + y
+        return z + x
+    }
+    return inner
+}
+let f = outer(10)
+stdout(f(5))
+if (true) {
+    let x = 100
+    stdout(x)
+}
+stdout(x)
+define counter() {
+    let n = 0
+    define step() {
+        n = n + 1
+        return n
+    }
+    return step
+}
+let s = counter()
+s()
+s()
+stdout(s())
+for (let i = 0 : i < 3 : i++) {
+    let v = i * 2
+    x = x + v
+}
+stdout(x)
+define use() {
+    return later
+}
+let later = 5
+stdout(use())
+""", "17\n100\n1\n3\n7\n5\n")
+
+    def test_scope_errors(self):
+        self.assertError("include 'standard'\nif (true) {\n    let hidden = 1\n}\nstdout(hidden)\n", 'NameException', 5)
+        self.assertError("let a = 1\nlet a = 2\n", 'NameException', 2)
+        self.assertError("const k = 1\ndefine set() {\n    k = 2\n}\nset()\n", 'TypeException', 3)
+        self.assertError("define f() {\n    return g\n}\nf()\n", 'NameException', 2)
+
+    def test_loop_variables_captured_by_closures(self):
+        # A loop body environment that a function or instance still refers to must not be reused
+        self.assertOutput("""
+include 'standard'
+let fs = new list()
+for (let i = 0 : i < 3 : i++) {
+    let j = i * 10
+    define get() { return j }
+    fs.append(get)
+}
+class Box{
+    define $struct(){
+        let this.made = 1
+    }
+    define seen(){ return tag }
+}
+let boxes = new list()
+let n = 0
+while (n < 3) {
+    let tag = n * 100
+    boxes.append(new Box())
+    if (true) {
+        let inner = n
+        define nested() { return inner + tag }
+        fs.append(nested)
+    }
+    n++
+}
+for (let k = 0 : k < 6 : k++) {
+    let g = fs.get(k)
+    stdout(g())
+}
+for (let m = 0 : m < 3 : m++) {
+    let b = boxes.get(m)
+    stdout(b.seen())
+}
+""", "0\n10\n20\n0\n101\n202\n0\n100\n200\n")
+
+if __name__ == '__main__':
+    unittest.main()
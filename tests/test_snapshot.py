@@ -0,0 +1,101 @@
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import interpreter
+from interpreter import ENGINES
+
+# --snapshot on every engine: a restored run prints what a fresh run prints, minus the output of
+# the initialization it skips, and a snapshot is rebuilt when an included file changes or skipped
+# when a global does not pickle.
+
+PROGRAM = """include 'standard'
+include 'lib.py++'
+class Node {
+    define $struct(value, next) {
+        let this.value = value
+        let this.next = next
+    }
+    define total() {
+        if (this.next == null) { return this.value }
+        return this.value + this.next.total()
+    }
+}
+define adder(n) {
+    define add(x) {
+        return x + n + base
+    }
+    return add
+}
+define build(count) {
+    let head = null
+    for (let i = 0 : i < count : i++) {
+        head = new Node(1, head)
+    }
+    return head
+}
+define length(node) {
+    let count = 0
+    while (node != null) {
+        count = count + 1
+        node = node.next
+    }
+    return count
+}
+let add5 = adder(5)
+let chain = new Node(1, new Node(2, new Node(3, null)))
+let long = build(20000)
+let names = list('a', 'b')
+stdout('running')
+stdout(add5(1), chain.total(), length(long), names, base)
+"""
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+        self.addCleanup(os.chdir, self.cwd)
+
+    def write(self, path, source):
+        with open(path, 'w') as f: f.write(source)
+
+    def run_file(self, file, engine):
+        output, errors = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+            interpreter.interpret_file(file, engine=engine, cache=False, snapshot='program.snapshot')
+        return output.getvalue(), errors.getvalue()
+
+    def test_round_trip(self):
+        self.write('main.py++', PROGRAM)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.write('lib.py++', "include 'standard'\nstdout('lib loaded')\nlet base = 10\n")
+                self.assertEqual(self.run_file('main.py++', engine), ("lib loaded\nrunning\n16 6 20000 List('a', 'b') 10\n", ''))
+                self.assertTrue(os.path.exists('program.snapshot'))
+                self.assertEqual(self.run_file('main.py++', engine), ("running\n16 6 20000 List('a', 'b') 10\n", ''))
+                self.write('lib.py++', "include 'standard'\nstdout('lib changed')\nlet base = 100\n")
+                self.assertEqual(self.run_file('main.py++', engine), ("lib changed\nrunning\n106 6 20000 List('a', 'b') 100\n", ''))
+                self.assertEqual(self.run_file('main.py++', engine), ("running\n106 6 20000 List('a', 'b') 100\n", ''))
+                os.remove('program.snapshot')
+
+    def test_unpicklable_global(self):
+        self.write('data.txt', "first\nsecond\n")
+        self.write('main.py++', "include 'standard'\ninclude 'streams'\nlet input = lines('data.txt')\nstdout(input.next())\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                for _ in range(2):
+                    output, errors = self.run_file('main.py++', engine)
+                    self.assertEqual(output, 'first\n')
+                    self.assertTrue(errors.startswith("Snapshot not written, cannot save 'input' (<lines data.txt>"))
+                    self.assertFalse(os.path.exists('program.snapshot'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Client
+from Batch import WorkerPool, TIMEOUT_STATUS
+from Daemon import Daemon
+from interpreter import ENGINES
+
+# The worker processes behind --batch and --daemon, on every engine: every request starts from
+# fresh globals, includes included, and workers that time out or die while running a request.
+
+COUNTER = "include 'standard'\nlet count = 0\ndefine bump() {\n    count = count + 1\n    return count\n}\n"
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        sys.path.insert(0, self.directory)  # workers are forked, so they find the Python modules written here
+        self.addCleanup(sys.path.remove, self.directory)
+
+    def write(self, name, source):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f: f.write(source)
+        return path
+
+    def pool(self, engine, count=1):
+        pool = WorkerPool(count, (engine, False, False, False))
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_isolation(self):
+        self.write('counter.py++', COUNTER)
+        job = self.write('job.py++', "include 'counter.py++'\nbump()\nstdout(bump())\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                pool = self.pool(engine)
+                requests = [{'file': job}] * 3 + [{'source': "let leaked = 1"}, {'source': "include 'standard'\nstdout(leaked)"}]
+                replies = pool.run_all([dict(request, cwd=self.directory) for request in requests])
+                self.assertEqual([reply['output'] for reply in replies[:4]], ['2\n', '2\n', '2\n', ''])
+                self.assertEqual(replies[4]['status'], 1)
+                self.assertIn("Variable 'leaked' is not defined", replies[4]['output'])
+                self.assertEqual(len({reply['worker'] for reply in replies}), 1)
+                # An include edited between requests is parsed again
+                self.write('counter.py++', COUNTER.replace('let count = 0', 'let count = 10'))
+                self.assertEqual(pool.run({'file': job, 'cwd': self.directory})['output'], '12\n')
+                self.write('counter.py++', COUNTER)
+
+    def test_daemon(self):
+        self.write('counter.py++', COUNTER)
+        job = self.write('job.py++', "include 'counter.py++'\nstdout(bump())\n")
+        socket = os.path.join(self.directory, 'daemon.sock')
+        cwd = os.getcwd()
+        os.chdir(self.directory)  # Client.request sends its cwd, which includes are found from
+        self.addCleanup(os.chdir, cwd)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                daemon = Daemon(socket, engine, workers=2, cache=False)
+                thread = threading.Thread(target=daemon.serve_forever)
+                thread.start()
+                try:
+                    replies = [Client.request(socket, file=job) for _ in range(4)]
+                    self.assertEqual([(reply['status'], reply['output']) for reply in replies], [(0, '1\n')] * 4)
+                    reply = Client.request(socket, source="include 'counter.py++'\nstdout(bump(), bump())")
+                    self.assertEqual((reply['status'], reply['output']), (0, '1 2\n'))
+                    reply = Client.request(socket, source="while (true) { }", timeout=0.5)
+                    self.assertEqual(reply['status'], TIMEOUT_STATUS)
+                    self.assertEqual(Client.request(socket, file=job)['output'], '1\n')
+                finally:
+                    daemon.shutdown(); thread.join(); daemon.server_close()
+                self.assertFalse(os.path.exists(socket))
+
+    def test_crash_and_timeout(self):
+        self.write('exits.py', "import os\nos._exit(3)\n")
+        self.write('killed.py', "import os, signal\nos.kill(os.getpid(), signal.SIGKILL)\n")
+        fine = self.write('fine.py++', "include 'standard'\nstdout('fine')\n")
+        exits = self.write('exits.py++', "include 'exits'\n")
+        killed = self.write('killed.py++', "include 'killed'\n")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                pool = self.pool(engine)
+                replies = pool.run_all([{'file': fine}, {'file': exits}, {'file': fine}, {'file': killed}, {'file': fine}])
+                self.assertEqual([(reply['status'], reply['output']) for reply in replies], [
+                    (0, 'fine\n'), (3, 'Worker crashed: exited with status 3\n'), (0, 'fine\n'),
+                    (137, 'Worker crashed: killed by signal 9\n'), (0, 'fine\n')])
+                reply = pool.run({'source': "while (true) { }"}, timeout=0.5)
+                self.assertEqual((reply['status'], reply['output']), (TIMEOUT_STATUS, "Timed out after 0.5 s\n"))
+                self.assertEqual(pool.run({'source': "include 'standard'\nstdout(1)"})['output'], '1\n')
+
+if __name__ == '__main__':
+    unittest.main()